@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -21,3 +21,32 @@ SessionLocal = sessionmaker(
 )
 
 Base = declarative_base()
+
+
+def create_missing_indexes():
+    """
+    create_all() only creates indexes together with new tables,
+    so add any index declared on a model that an existing table lacks.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def create_missing_columns():
+    """
+    create_all() never alters existing tables, so add columns declared on a
+    model that an existing table lacks. Only nullable columns are added;
+    anything else still needs migrate_db.py.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
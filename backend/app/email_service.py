@@ -54,3 +54,38 @@ EV Charging Team
     fm = FastMail(conf)
     await fm.send_message(message)
     print(f"[EMAIL] OTP sent to {email}")
+
+
+async def send_waitlist_email(email: str, station_id: int, booking_id: int, pay_by):
+    """
+    Tell a waitlisted user their booking went through
+    
+    Args:
+        email: Recipient email address
+        station_id: Station the slot was freed at
+        booking_id: The booking created for them
+        pay_by: When the unpaid booking expires (UTC)
+    """
+    message = MessageSchema(
+        subject="EV Charging - Your slot is ready",
+        recipients=[email],
+        body=f"""
+Hello,
+
+A charging slot opened up at station #{station_id} and your waitlist request
+has been booked for you.
+
+⚡ Booking ID: {booking_id}
+
+Please complete the payment before {pay_by:%Y-%m-%d %H:%M} UTC, otherwise
+the slot goes to the next person in the queue.
+
+Thank you,
+EV Charging Team
+""",
+        subtype="plain"
+    )
+
+    fm = FastMail(conf)
+    await fm.send_message(message)
+    print(f"[EMAIL] Waitlist promotion sent to {email}")
@@ -2,7 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # IMPORT DB & MODELS
-from .database import Base, engine, SessionLocal
+from .database import Base, engine, SessionLocal, create_missing_columns, create_missing_indexes
 from . import models
 
 # IMPORT ROUTERS
@@ -12,16 +12,23 @@ from .routers import auth, bookings, stations, payments, admin, analytics, compa
 from .seed_stations import seed_stations
 from .seed_companies import seed_companies
 from .services.auth_service import hash_password
+from .services.booking_holds import hold_sweeper
+from .services.booking_lifecycle import backfill_booking_dates, backfill_station_capacity, completion_scheduler
+from .services.payment_ingest import payment_ingest
 
 # CREATE APP
 app = FastAPI(title="Vehicle Charging Point Booking API")
 
 # CREATE TABLES (RUNS ON STARTUP)
 Base.metadata.create_all(bind=engine)
+create_missing_columns()
+create_missing_indexes()
 
 # SEED DEFAULT STATIONS AND COMPANIES
 seed_stations()
 seed_companies()
+backfill_booking_dates()
+backfill_station_capacity()
 
 # ✅ CREATE DEFAULT ADMIN USER
 def create_default_admin():
@@ -61,6 +68,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],  # Pagination cursors and cache validators
 )
 
 # INCLUDE ROUTERS
@@ -72,6 +80,19 @@ app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 app.include_router(analytics.router)  # No prefix, routes are /analytics/*
 app.include_router(companies.router)  # No prefix, routes are /companies/*
 
+# ✅ BACKGROUND JOBS
+@app.on_event("startup")
+def start_background_jobs():
+    hold_sweeper.start()
+    completion_scheduler.start()
+    payment_ingest.start()
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    hold_sweeper.stop()
+    completion_scheduler.stop()
+    payment_ingest.stop()
+
 # ✅ ROOT TEST
 @app.get("/")
 def root():
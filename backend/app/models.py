@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Time, Date, DateTime, ForeignKey, Boolean, Enum
+from sqlalchemy import Column, Integer, String, Text, Float, Time, Date, DateTime, ForeignKey, Boolean, Enum, Index
 from .database import Base
 from datetime import datetime
 import enum
@@ -58,8 +58,14 @@ class ChargingStation(Base):
     opening_time = Column(Time)
     closing_time = Column(Time)
     available_slots = Column(Integer, default=0)
+    capacity = Column(Integer, nullable=True)  # Chargers at the station; available_slots is how many are free now
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Bounding-box prefilter for nearby search
+        Index("ix_charging_stations_lat_lon", "latitude", "longitude"),
+    )
+
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -67,6 +73,7 @@ class Booking(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=True)  # Track which company
+    name = Column(String, nullable=True)
     phone = Column(String)
     car_number = Column(String)
     station_id = Column(Integer, ForeignKey("charging_stations.id"))
@@ -75,8 +82,87 @@ class Booking(Base):
     amount = Column(Integer)
     status = Column(String, default="pending")
     date = Column(Date)
+    hold_expires_at = Column(DateTime, nullable=True)  # Unpaid bookings release their capacity after this
+    ends_at = Column(DateTime, nullable=True)  # Local time charging ends; paid bookings are completed after it
+    refund_due = Column(Integer, nullable=True)  # ₹ paid for a booking cancelled after payment, owed back to the customer
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # GET /bookings pages newest first on (created_at, id), optionally filtered
+    __table_args__ = (
+        Index("ix_bookings_created_id", "created_at", "id"),
+        Index("ix_bookings_station_created_id", "station_id", "created_at", "id"),
+        Index("ix_bookings_company_created_id", "company_id", "created_at", "id"),
+        Index("ix_bookings_status_created_id", "status", "created_at", "id"),
+        # Per-user history, newest booking date first
+        Index("ix_bookings_user_date_id", user_id, date.desc(), id.desc()),
+        # Hold sweeper: due unpaid holds
+        Index("ix_bookings_status_hold", "status", "hold_expires_at"),
+        # Completion scheduler: finished paid bookings
+        Index("ix_bookings_status_ends", "status", "ends_at"),
+    )
+
+
+class StationSlotUsage(Base):
+    """Bookings running in one 15-minute slot of one day at a station"""
+    __tablename__ = "station_slot_usage"
+
+    station_id = Column(Integer, ForeignKey("charging_stations.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    slot = Column(Integer, primary_key=True)  # 0-95, slot n starts at n * 15 minutes
+    used = Column(Integer, nullable=False, default=0)
+
+
+class Tariff(Base):
+    """
+    Hourly rate for bookings matching every set condition. Station-specific
+    tariffs beat network-wide ones, charging-type-specific beat generic, and
+    among those the highest min_hours the booking reaches applies.
+    """
+    __tablename__ = "tariffs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    station_id = Column(Integer, ForeignKey("charging_stations.id"), nullable=True)  # NULL = all stations
+    charging_type = Column(String, nullable=True)  # NULL = any type
+    start_hour = Column(Integer, default=0, nullable=False)  # Time-of-day band [start_hour, end_hour),
+    end_hour = Column(Integer, default=24, nullable=False)  # wrapping past midnight when end <= start
+    min_hours = Column(Integer, default=1, nullable=False)  # Applies to bookings at least this long
+    rate_per_hour = Column(Integer, nullable=False)  # ₹ per hour
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class WaitlistEntry(Base):
+    """A booking request queued until its station has a free slot"""
+    __tablename__ = "waitlist_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    station_id = Column(Integer, ForeignKey("charging_stations.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=True)
+    name = Column(String, nullable=True)
+    phone = Column(String)
+    email = Column(String, nullable=True)  # Notified on promotion
+    car_number = Column(String)
+    hours = Column(Integer)
+    priority = Column(Integer, default=0, nullable=False)  # Higher goes first; FIFO within a priority
+    status = Column(String, default="waiting", nullable=False)  # waiting, promoted, cancelled
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=True)  # Set on promotion
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_waitlist_station_status_priority", "station_id", "status", "priority", "id"),
+    )
+
+
+class IdempotencyRecord(Base):
+    """Stored response of a request sent with an Idempotency-Key header"""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)  # "<scope>:<Idempotency-Key>"
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is running
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
 
 class Analytics(Base):
     """Store analytics data for dashboard"""
@@ -97,10 +183,30 @@ class Payment(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    booking_id = Column(Integer, ForeignKey("bookings.id"))
+    booking_id = Column(Integer, ForeignKey("bookings.id"), index=True)
     phone = Column(String)
     car_number = Column(String)
     amount = Column(Integer)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
 
+class PaymentCallback(Base):
+    """Outbox of payment gateway callbacks, acknowledged before they are applied"""
+    __tablename__ = "payment_callbacks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    callback_key = Column(String, unique=True, nullable=True)  # Idempotency-Key sent by the gateway
+    booking_id = Column(Integer, nullable=False)
+    amount = Column(Integer, nullable=False)
+    phone = Column(String, nullable=True)
+    status = Column(String, default="received")  # received, applied, rejected, failed
+    error = Column(String, nullable=True)
+    payment_id = Column(Integer, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow)
+    applied_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_payment_callbacks_status_id", "status", "id"),
+    )
+
+
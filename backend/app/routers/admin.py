@@ -1,11 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from .. import models
-from ..services.auth_service import hash_password, verify_password
+from ..services.auth_service import get_user_by_id, hash_password, verify_password
 from ..database import SessionLocal
+from ..services.table_versions import bump_table_version
+from ..services.tariffs import TARIFFS_TABLE
+from .bookings import current_user_id
+from ..services.reconciliation import reconcile, DEFAULT_CHUNK_SIZE, DEFAULT_SAMPLE, MAX_WORKERS
+from pydantic import BaseModel, Field
+from typing import Optional
+import threading
 
 router = APIRouter(tags=["Admin"])
 
+class TariffCreate(BaseModel):
+    station_id: Optional[int] = None
+    charging_type: Optional[str] = None
+    start_hour: int = Field(0, ge=0, le=23)
+    end_hour: int = Field(24, ge=1, le=24)
+    min_hours: int = Field(1, ge=1, le=24)
+    rate_per_hour: int = Field(..., ge=0)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -13,6 +28,13 @@ def get_db():
     finally:
         db.close()
 
+def require_admin(caller_id: int = Depends(current_user_id), db: Session = Depends(get_db)) -> int:
+    """Dependency: the caller's bearer token must belong to an admin user"""
+    caller = get_user_by_id(db, caller_id)
+    if not caller or not caller.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return caller_id
+
 def create_admin(db: Session, email: str, password: str):
     admin = models.Admin(
         email=email,
@@ -40,3 +62,54 @@ def authenticate_admin(db: Session, email: str, password: str):
 @router.get("/health")
 def admin_health():
     return {"status": "admin router is working"}
+
+# ✅ TARIFFS (server-side booking prices)
+@router.get("/tariffs")
+def list_tariffs(db: Session = Depends(get_db)):
+    return db.query(models.Tariff).order_by(models.Tariff.id).all()
+
+@router.post("/tariffs")
+def create_tariff(data: TariffCreate, admin_id: int = Depends(require_admin), db: Session = Depends(get_db)):
+    try:
+        tariff = models.Tariff(**data.dict())
+        db.add(tariff)
+        db.commit()
+        db.refresh(tariff)
+        bump_table_version(TARIFFS_TABLE)
+        return tariff
+    except Exception as e:
+        db.rollback()
+        print(f"Error creating tariff: {e}")
+        raise HTTPException(status_code=400, detail=f"Error creating tariff: {str(e)}")
+
+@router.delete("/tariffs/{tariff_id}")
+def delete_tariff(tariff_id: int, admin_id: int = Depends(require_admin), db: Session = Depends(get_db)):
+    tariff = db.query(models.Tariff).filter(models.Tariff.id == tariff_id).first()
+    if not tariff:
+        raise HTTPException(status_code=404, detail="Tariff not found")
+    db.delete(tariff)
+    db.commit()
+    bump_table_version(TARIFFS_TABLE)
+    return {"message": "Tariff deleted"}
+
+# ✅ PAYMENT RECONCILIATION (Admin only)
+_reconciliation_running = threading.Lock()
+
+@router.get("/reconciliation")
+def run_reconciliation(
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1000, le=1000000),
+    workers: Optional[int] = Query(None, ge=1, le=MAX_WORKERS),
+    sample: int = Query(DEFAULT_SAMPLE, ge=0, le=1000),
+    admin_id: int = Depends(require_admin)
+):
+    """Paid bookings with no payment, payment totals off the booking amount, duplicate payments"""
+    # Each run scans both tables on a pool of processes; never run two at once
+    if not _reconciliation_running.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A reconciliation is already running")
+    try:
+        return reconcile(chunk_size, workers, sample)
+    except Exception as e:
+        print(f"Error reconciling payments: {e}")
+        raise HTTPException(status_code=500, detail=f"Error reconciling payments: {str(e)}")
+    finally:
+        _reconciliation_running.release()
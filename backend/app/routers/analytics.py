@@ -4,6 +4,7 @@ from sqlalchemy import func, and_
 from ..database import SessionLocal
 from ..models import Company, ChargingStation, Booking, Analytics, Payment, User
 from ..schemas import CompanyStats, DashboardStats, CompanyOut, CompanyCreate, AnalyticsEvent
+from ..services.table_versions import bump_table_version
 from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
@@ -36,6 +37,7 @@ def track_view(company_id: int, db: Session = Depends(get_db)):
         )
         db.add(event)
         db.commit()
+        bump_table_version(Company.__tablename__)
         
         return {"message": "View tracked", "views": company.views}
     except Exception as e:
@@ -63,6 +65,8 @@ def track_booking(event: AnalyticsEvent, db: Session = Depends(get_db)):
                 company.bookings_count += 1
         
         db.commit()
+        if event.company_id:
+            bump_table_version(Company.__tablename__)
         return {"message": "Booking event tracked"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -22,7 +22,7 @@ from ..schemas import (
     OTPRequest, OTPVerify, SetPasswordRequest
 )
 from ..services.auth_service import (
-    hash_password, verify_password, get_user_by_email, get_user_by_id
+    hash_password, verify_password, get_user_by_email, get_user_by_id, user_id_from_token
 )
 from ..services.otp_service import (
     generate_otp, get_otp_expiry, is_otp_expired
@@ -356,8 +356,7 @@ def verify_token(token: str = None):
         )
     
     try:
-        decoded = base64.b64decode(token.encode()).decode()
-        user_id = int(decoded.split(':')[0])
+        user_id = user_id_from_token(token)
         return {"valid": True, "user_id": user_id}
     except:
         raise HTTPException(
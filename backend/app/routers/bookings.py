@@ -1,11 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from ..database import SessionLocal
-from ..schemas import BookingCreate, BookingOut
-from ..services.booking_service import create_booking, get_bookings
+from ..schemas import BookingCreate, BookingOut, BookingHistoryOut
+from ..services.booking_service import (
+    create_booking, create_bookings_bulk, get_bookings, get_user_bookings, payment_status,
+    StationNotFound, NoSlotsAvailable, InvalidBookingWindow
+)
+from ..services.booking_lifecycle import cancel_booking, complete_booking, BookingNotFound, InvalidTransition
+from ..services.waitlist import waitlist
+from ..services.capacity_calendar import MAX_BOOKING_HOURS
+from ..services.auth_service import get_user_by_id, user_id_from_token
+from ..utils.serialization import FastJSONResponse, project, response_fields, response_headers
+from ..utils.idempotency import idempotent
 from .. import models
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional
+from datetime import date, datetime
+import base64
 
-router = APIRouter(prefix="/bookings", tags=["Bookings"])
+router = APIRouter(tags=["Bookings"])  # Mounted at /bookings in main.py
+
+MAX_BULK_BOOKINGS = 500
+
+BOOKING_FIELDS = response_fields(BookingOut)
+HISTORY_FIELDS = response_fields(BookingHistoryOut)
+
+
+class BulkBookingRequest(BaseModel):
+    items: list[BookingCreate] = Field(..., min_length=1, max_length=MAX_BULK_BOOKINGS)
+
+
+class WaitlistRequest(BaseModel):
+    station_id: int
+    company_id: Optional[int] = None
+    user_id: Optional[int] = None
+    name: str
+    car_number: str
+    phone: str
+    hours: int = Field(..., ge=1, le=MAX_BOOKING_HOURS)
+    email: Optional[EmailStr] = None  # Notified when the booking is made
+    priority: int = Field(0, ge=0, le=10)  # Higher is served first
+
+
+def waitlist_json(entry, db: Session) -> dict:
+    data = {
+        "id": entry.id,
+        "station_id": entry.station_id,
+        "status": entry.status,
+        "priority": entry.priority,
+        "booking_id": entry.booking_id,
+        "created_at": entry.created_at
+    }
+    if entry.status == "waiting":
+        data["position"] = waitlist.position(db, entry)
+    return data
+
+
+def encode_bookings_cursor(key, booking_id: int) -> str:
+    """key is the created_at (GET /bookings) or date (history) of the last booking"""
+    return base64.urlsafe_b64encode(f"{key.isoformat()}|{booking_id}".encode()).decode()
+
+
+def decode_bookings_cursor(cursor: str, parse=datetime.fromisoformat):
+    try:
+        key, booking_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return parse(key), int(booking_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 def get_db():
     db = SessionLocal()
@@ -14,39 +75,225 @@ def get_db():
     finally:
         db.close()
 
+def current_user_id(authorization: str = Header(None)) -> int:
+    """User id from the 'Authorization: Bearer <token>' header"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    try:
+        return user_id_from_token(token)
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+def optional_user_id(authorization: str = Header(None)) -> Optional[int]:
+    """current_user_id() for routes that also take anonymous callers; None without a token"""
+    return current_user_id(authorization) if authorization else None
+
+# Bookings belong to the caller's token, never to a user_id sent in the body
 @router.post("/", response_model=BookingOut)
-def book(data: BookingCreate, db: Session = Depends(get_db)):
+def book(
+    data: BookingCreate,
+    idempotency_key: Optional[str] = Header(None, description="Retries with the same key replay the first booking"),
+    user_id: Optional[int] = Depends(optional_user_id),
+    db: Session = Depends(get_db)
+):
+    data.user_id = user_id
+    
+    def run():
+        try:
+            return project(create_booking(db, data), BOOKING_FIELDS)
+        except StationNotFound:
+            raise HTTPException(status_code=404, detail="Station not found")
+        except InvalidBookingWindow as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except NoSlotsAvailable:
+            raise HTTPException(status_code=409, detail="No slots available at this station; join POST /bookings/waitlist to get the next one")
+        except Exception as e:
+            db.rollback()
+            print(f"Error creating booking: {e}")
+            raise HTTPException(status_code=400, detail=f"Error creating booking: {str(e)}")
+    
+    return idempotent(db, "bookings", idempotency_key, data.dict(), run)
+
+# ✅ BOOK MANY VEHICLES AT ONCE (fleet operators)
+@router.post("/bulk")
+def book_bulk(
+    data: BulkBookingRequest,
+    idempotency_key: Optional[str] = Header(None, description="Retries with the same key replay the first result"),
+    user_id: Optional[int] = Depends(optional_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Items are booked independently: the response has one result per item,
+    in request order, with either a booking_id or an error.
+    """
+    for item in data.items:
+        item.user_id = user_id
+    
+    def run():
+        try:
+            results = create_bookings_bulk(db, data.items)
+        except Exception as e:
+            db.rollback()
+            print(f"Error creating bookings: {e}")
+            raise HTTPException(status_code=400, detail=f"Error creating bookings: {str(e)}")
+        booked = sum(1 for r in results if r["status"] == "booked")
+        return {"booked": booked, "failed": len(results) - booked, "results": results}
+    
+    return idempotent(db, "bookings-bulk", idempotency_key, data.dict(), run)
+
+# ✅ JOIN A STATION'S WAITLIST (instead of retrying while it is full)
+@router.post("/waitlist", response_class=FastJSONResponse)
+def join_waitlist(
+    data: WaitlistRequest,
+    user_id: Optional[int] = Depends(optional_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a booking for the station's next free slot. If one is free already
+    the entry is booked at once; either way poll GET /bookings/waitlist/{id}
+    or wait for the email.
+    """
+    data.user_id = user_id
     try:
-        # Validate station exists
-        station = db.query(models.ChargingStation).filter(
-            models.ChargingStation.id == data.station_id
-        ).first()
-        
+        station = db.query(models.ChargingStation.id).filter(models.ChargingStation.id == data.station_id).first()
         if not station:
             raise HTTPException(status_code=404, detail="Station not found")
-        
-        if station.available_slots <= 0:
-            raise HTTPException(status_code=409, detail="No slots available at this station")
-        
-        # Create booking
-        booking = create_booking(db, data)
-        
-        # Decrease available slots
-        station.available_slots -= 1
-        db.commit()
-        
-        return booking
+        entry = waitlist.enqueue(db, data, data.priority, data.email)
+        db.refresh(entry)
+        return FastJSONResponse(waitlist_json(entry, db))
     except HTTPException:
         raise
     except Exception as e:
         db.rollback()
-        print(f"Error creating booking: {e}")
-        raise HTTPException(status_code=400, detail=f"Error creating booking: {str(e)}")
+        print(f"Error joining waitlist: {e}")
+        raise HTTPException(status_code=400, detail=f"Error joining waitlist: {str(e)}")
+
+@router.get("/waitlist/{entry_id}", response_class=FastJSONResponse)
+def get_waitlist_entry(entry_id: int, db: Session = Depends(get_db)):
+    entry = db.query(models.WaitlistEntry).filter(models.WaitlistEntry.id == entry_id).first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="Waitlist entry not found")
+    return FastJSONResponse(waitlist_json(entry, db))
 
-@router.get("/", response_model=list[BookingOut])
-def list_all(db: Session = Depends(get_db)):
+@router.delete("/waitlist/{entry_id}")
+def leave_waitlist(entry_id: int, db: Session = Depends(get_db)):
+    if not waitlist.cancel(db, entry_id):
+        entry = db.query(models.WaitlistEntry.status).filter(models.WaitlistEntry.id == entry_id).first()
+        if not entry:
+            raise HTTPException(status_code=404, detail="Waitlist entry not found")
+        raise HTTPException(status_code=409, detail=f"Waitlist entry is already {entry.status}")
+    return {"message": "Left the waitlist"}
+
+# ✅ CANCEL / COMPLETE A BOOKING (owner or admin; gives its capacity back)
+def check_booking_access(db: Session, booking_id: int, caller_id: int):
+    """404 for unknown bookings, 403 unless the caller made the booking or is an admin"""
+    booking = db.query(models.Booking.user_id).filter(models.Booking.id == booking_id).first()
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if booking.user_id is None or booking.user_id != caller_id:
+        caller = get_user_by_id(db, caller_id)
+        if not caller or not caller.is_admin:
+            raise HTTPException(status_code=403, detail="Not your booking")
+
+def change_status(booking_id: int, change, caller_id: int, db: Session):
+    check_booking_access(db, booking_id, caller_id)
     try:
-        return get_bookings(db)
+        change(db, booking_id)
+        booking = db.query(models.Booking).filter(models.Booking.id == booking_id).first()
+        return FastJSONResponse(project(booking, BOOKING_FIELDS))
+    except BookingNotFound:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    except InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        print(f"Error updating booking: {e}")
+        raise HTTPException(status_code=400, detail=f"Error updating booking: {str(e)}")
+
+@router.post("/{booking_id}/cancel", response_model=BookingOut, response_class=FastJSONResponse)
+def cancel(booking_id: int, caller_id: int = Depends(current_user_id), db: Session = Depends(get_db)):
+    """Payments of a cancelled booking are kept; their total is returned as refund_due"""
+    return change_status(booking_id, cancel_booking, caller_id, db)
+
+@router.post("/{booking_id}/complete", response_model=BookingOut, response_class=FastJSONResponse)
+def complete(booking_id: int, caller_id: int = Depends(current_user_id), db: Session = Depends(get_db)):
+    return change_status(booking_id, complete_booking, caller_id, db)
+
+@router.get("/", response_model=list[BookingOut], response_class=FastJSONResponse)
+def list_all(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    station_id: Optional[int] = None,
+    company_id: Optional[int] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    after = decode_bookings_cursor(cursor) if cursor else None
+    try:
+        bookings, has_more = get_bookings(
+            db, limit, after,
+            station_id=station_id,
+            company_id=company_id,
+            status=status,
+            created_from=created_from,
+            created_to=created_to
+        )
+        
+        # Newest first; the next page is advertised in a header
+        if has_more and bookings:
+            last = bookings[-1]
+            response.headers["X-Next-Cursor"] = encode_bookings_cursor(last.created_at, last.id)
+        
+        return FastJSONResponse([project(b, BOOKING_FIELDS) for b in bookings], headers=response_headers(response))
     except Exception as e:
         print(f"Error fetching bookings: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching bookings: {str(e)}")
+
+
+def booking_history(db: Session, response: Response, user_id: int, limit: int, cursor: Optional[str]):
+    after = decode_bookings_cursor(cursor, date.fromisoformat) if cursor else None
+    try:
+        rows, has_more = get_user_bookings(db, user_id, limit, after)
+        
+        if has_more and rows:
+            last = rows[-1][0]
+            response.headers["X-Next-Cursor"] = encode_bookings_cursor(last.date, last.id)
+        
+        history = [
+            project(b, HISTORY_FIELDS, station_name=station_name, payment_status=payment_status(b.amount, paid))
+            for b, station_name, paid in rows
+        ]
+        return FastJSONResponse(history, headers=response_headers(response))
+    except Exception as e:
+        print(f"Error fetching booking history: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching booking history: {str(e)}")
+
+# ✅ MY BOOKINGS
+@router.get("/me", response_model=list[BookingHistoryOut], response_class=FastJSONResponse)
+def my_bookings(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    user_id: int = Depends(current_user_id),
+    db: Session = Depends(get_db)
+):
+    return booking_history(db, response, user_id, limit, cursor)
+
+# ✅ BOOKINGS OF ANY USER (Admin only)
+@router.get("/user/{user_id}", response_model=list[BookingHistoryOut], response_class=FastJSONResponse)
+def user_bookings(
+    user_id: int,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    caller_id: int = Depends(current_user_id),
+    db: Session = Depends(get_db)
+):
+    caller = get_user_by_id(db, caller_id)
+    if not caller or not caller.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return booking_history(db, response, user_id, limit, cursor)
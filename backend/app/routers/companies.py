@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from ..database import SessionLocal
 from ..models import Company, ChargingStation, User, Booking
 from ..schemas import CompanyCreate, CompanyOut
+from ..services.table_versions import table_version, bump_table_version
+from ..utils.etag import make_etag, not_modified
+from ..utils.serialization import FastJSONResponse, project, response_fields, response_headers
 from datetime import datetime
 
 router = APIRouter(prefix="/companies", tags=["Companies"])
 
+COMPANY_FIELDS = response_fields(CompanyOut)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -36,6 +41,7 @@ def create_company(company: CompanyCreate, db: Session = Depends(get_db)):
         )
         db.add(new_company)
         db.commit()
+        bump_table_version(Company.__tablename__)
         db.refresh(new_company)
         return new_company
     except HTTPException:
@@ -46,8 +52,10 @@ def create_company(company: CompanyCreate, db: Session = Depends(get_db)):
 
 
 # ✅ GET ALL COMPANIES
-@router.get("/", response_model=list[CompanyOut])
+@router.get("/", response_model=list[CompanyOut], response_class=FastJSONResponse)
 def list_companies(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
     country: str = Query(None),
@@ -57,6 +65,11 @@ def list_companies(
 ):
     """List all companies with optional filtering and search"""
     try:
+        etag = make_etag("companies", table_version(Company.__tablename__), str(request.query_params))
+        cached = not_modified(request, response, etag)
+        if cached:
+            return cached
+        
         query = db.query(Company)
         
         # Apply filters
@@ -71,20 +84,20 @@ def list_companies(
             )
         
         companies = query.order_by(Company.views.desc()).offset(skip).limit(limit).all()
-        return companies
+        return FastJSONResponse([project(c, COMPANY_FIELDS) for c in companies], headers=response_headers(response))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # ✅ GET SINGLE COMPANY
-@router.get("/{company_id}", response_model=CompanyOut)
+@router.get("/{company_id}", response_model=CompanyOut, response_class=FastJSONResponse)
 def get_company(company_id: int, db: Session = Depends(get_db)):
     """Get a single company by ID"""
     try:
         company = db.query(Company).filter(Company.id == company_id).first()
         if not company:
             raise HTTPException(status_code=404, detail="Company not found")
-        return company
+        return FastJSONResponse(project(company, COMPANY_FIELDS))
     except HTTPException:
         raise
     except Exception as e:
@@ -109,6 +122,7 @@ def update_company(company_id: int, company_data: CompanyCreate, db: Session = D
         company.updated_at = datetime.utcnow()
         
         db.commit()
+        bump_table_version(Company.__tablename__)
         db.refresh(company)
         return company
     except HTTPException:
@@ -129,6 +143,7 @@ def delete_company(company_id: int, db: Session = Depends(get_db)):
         
         db.delete(company)
         db.commit()
+        bump_table_version(Company.__tablename__)
         return None
     except HTTPException:
         raise
@@ -172,9 +187,14 @@ def get_company_stations(company_id: int, db: Session = Depends(get_db)):
 
 # ✅ GET COUNTRIES LIST
 @router.get("/meta/countries", tags=["Metadata"])
-def get_countries(db: Session = Depends(get_db)):
+def get_countries(request: Request, response: Response, db: Session = Depends(get_db)):
     """Get list of all countries with companies"""
     try:
+        etag = make_etag("company-countries", table_version(Company.__tablename__))
+        cached = not_modified(request, response, etag)
+        if cached:
+            return cached
+        
         countries = db.query(Company.country).distinct().all()
         return {"countries": [c[0] for c in countries if c[0]]}
     except Exception as e:
@@ -183,9 +203,14 @@ def get_countries(db: Session = Depends(get_db)):
 
 # ✅ GET CATEGORIES LIST
 @router.get("/meta/categories", tags=["Metadata"])
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(request: Request, response: Response, db: Session = Depends(get_db)):
     """Get list of all categories"""
     try:
+        etag = make_etag("company-categories", table_version(Company.__tablename__))
+        cached = not_modified(request, response, etag)
+        if cached:
+            return cached
+        
         categories = db.query(Company.category).distinct().all()
         return {"categories": [c[0] for c in categories if c[0]]}
     except Exception as e:
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from ..database import SessionLocal
 from ..schemas import PaymentCreate, PaymentOut
-from ..services.payment_service import create_payment
+from ..services.payment_service import process_payment as record_payment, PaymentRejected
+from ..services.booking_lifecycle import BookingNotFound
+from ..services.payment_ingest import payment_ingest, IngestBusy, RESCAN_INTERVAL
 from .. import models
+from ..utils.idempotency import idempotent
 from pydantic import BaseModel
+from typing import Optional
 
 router = APIRouter(tags=["Payments"])
 
@@ -21,28 +26,45 @@ class PaymentRequest(BaseModel):
     phone: str
 
 @router.post("/process")
-def process_payment(data: PaymentRequest, db: Session = Depends(get_db)):
+def process_payment(
+    data: PaymentRequest,
+    idempotency_key: Optional[str] = Header(None, description="Retries with the same key replay the first result"),
+    db: Session = Depends(get_db)
+):
     """Process payment for a booking"""
-    try:
-        # Create payment record
-        payment = models.Payment(
-            booking_id=data.booking_id,
-            phone=data.phone,
-            amount=data.amount,
-            car_number=""
-        )
-        db.add(payment)
-        
-        # Update booking status to confirmed
-        booking = db.query(models.Booking).filter(models.Booking.id == data.booking_id).first()
-        if booking:
-            booking.status = "confirmed"
-        
-        db.commit()
-        db.refresh(payment)
-        return {"status": "success", "payment_id": payment.id, "message": "Payment processed"}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+    def run():
+        try:
+            payment = record_payment(db, data.booking_id, data.amount, data.phone)
+            return {"status": "success", "payment_id": payment.id, "message": "Payment processed"}
+        except BookingNotFound:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        except PaymentRejected as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except Exception as e:
+            print(f"Error processing payment: {e}")
+            raise HTTPException(status_code=500, detail=f"Error processing payment: {str(e)}")
+    
+    return idempotent(db, "payments", idempotency_key, data.dict(), run)
+
+# ✅ GATEWAY CALLBACK INGESTION
+@router.get("/callbacks/metrics")
+def callback_metrics(db: Session = Depends(get_db)):
+    """Queue depth, throughput and backpressure of the callback ingest worker"""
+    return payment_ingest.metrics(db)
+
+@router.get("/callbacks/{callback_id}")
+def get_callback(callback_id: int, db: Session = Depends(get_db)):
+    """Where a gateway callback is: received, applied, rejected or failed"""
+    callback = db.query(models.PaymentCallback).filter(models.PaymentCallback.id == callback_id).first()
+    if not callback:
+        raise HTTPException(status_code=404, detail="Callback not found")
+    return {
+        "callback_id": callback.id,
+        "booking_id": callback.booking_id,
+        "status": callback.status,
+        "payment_id": callback.payment_id,
+        "error": callback.error
+    }
 
 @router.get("/{payment_id}")
 def get_payment(payment_id: int, db: Session = Depends(get_db)):
@@ -52,7 +74,22 @@ def get_payment(payment_id: int, db: Session = Depends(get_db)):
         return {"error": "Payment not found"}
     return payment
 
-@router.post("/success")
-def payment_success(data: PaymentRequest, db: Session = Depends(get_db)):
-    """Success callback for payment"""
-    return process_payment(data, db)
+@router.post("/success", status_code=202)
+def payment_success(
+    data: PaymentRequest,
+    idempotency_key: Optional[str] = Header(None, description="Gateway retries with the same key are acknowledged once"),
+    db: Session = Depends(get_db)
+):
+    """Success callback for payment; acknowledged now, applied by the ingest worker"""
+    try:
+        callback, duplicate = payment_ingest.submit(db, data.booking_id, data.amount, data.phone, idempotency_key)
+        return {"status": "accepted", "callback_id": callback.id, "duplicate": duplicate}
+    except IngestBusy:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Payment queue is full, retry later"},
+            headers={"Retry-After": str(RESCAN_INTERVAL)}
+        )
+    except Exception as e:
+        print(f"Error accepting payment callback: {e}")
+        raise HTTPException(status_code=500, detail=f"Error accepting payment callback: {str(e)}")
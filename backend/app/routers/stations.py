@@ -1,15 +1,32 @@
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from ..database import SessionLocal
 from ..models import ChargingStation
-from ..utils.geo import distance_km
+from ..services.station_catalog import (
+    peek_catalog, get_catalog, catalog_version, invalidate_catalog, slots_version, station_slots,
+    stream_station_records
+)
+from ..services.station_search import nearest_stations
+from ..services.tariffs import get_tariffs
+from ..services.capacity_calendar import MAX_BOOKING_HOURS, peak_usage, peak_usage_many, station_capacity
+from ..services.station_import import StationImporter, DEFAULT_BATCH_SIZE, iter_lines, parse_line
 from ..utils.time_utils import is_station_open
-from pydantic import BaseModel
-from datetime import time
+from ..utils.etag import make_etag, not_modified
+from ..utils.serialization import FastJSONResponse, ndjson_chunk, project, response_fields, response_headers
+from .admin import require_admin
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import date, datetime, time, timedelta
+import base64
 
 router = APIRouter(tags=["Stations"])
 
+MAX_BATCH_IDS = 200  # GET /stations/batch; the POST form takes five times as many
+MAX_AVAILABILITY_CANDIDATES = 500  # Nearest stations checked by GET /stations/availability
+
 def get_db():
     db = SessionLocal()
     try:
@@ -22,6 +39,24 @@ class NearbyRequest(BaseModel):
     lon: float = None
     latitude: float = None
     longitude: float = None
+    radius_km: float = Field(10, gt=0, le=500)
+    k: int = Field(20, ge=1, le=200)
+    cursor: Optional[str] = None
+    open_now: bool = False
+    open_at: Optional[datetime] = None
+    hours: int = Field(1, ge=1, le=24)  # Duration the quoted price is for
+
+
+def encode_nearby_cursor(distance: float, station_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{distance!r}:{station_id}".encode()).decode()
+
+
+def decode_nearby_cursor(cursor: str):
+    try:
+        distance, station_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return float(distance), int(station_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 class StationCreate(BaseModel):
     name: str
@@ -30,6 +65,7 @@ class StationCreate(BaseModel):
     longitude: float
     phone: str
     available_slots: int = 5
+    capacity: Optional[int] = Field(None, ge=0)  # Chargers in total; defaults to available_slots
     opening_time: time
     closing_time: time
 
@@ -41,6 +77,7 @@ class StationOut(BaseModel):
     longitude: float
     phone: str
     available_slots: int
+    capacity: Optional[int] = None
     opening_time: time
     closing_time: time
     is_open: bool = None
@@ -48,34 +85,92 @@ class StationOut(BaseModel):
     class Config:
         from_attributes = True
 
+class StationBatchRequest(BaseModel):
+    ids: list[int] = Field(..., max_length=MAX_BATCH_IDS * 5)
+
+STATION_FIELDS = response_fields(StationOut)
+
+def station_json(s, is_open: bool, available_slots: int) -> dict:
+    """StationOut-shaped dict for FastJSONResponse; catalog records need no re-validation"""
+    return project(s, STATION_FIELDS, is_open=is_open, available_slots=available_slots)
+
+def stream_stations(now: datetime, open_at: Optional[datetime], chunk_size: int = 1000):
+    """NDJSON lines for GET /stations/?stream=1, sent one chunk of rows at a time"""
+    chunk = []
+    for s, slots in stream_station_records(chunk_size):
+        if open_at is not None and not is_station_open(s.opening_time, s.closing_time, open_at):
+            continue
+        chunk.append(station_json(s, is_station_open(s.opening_time, s.closing_time, now), slots))
+        if len(chunk) >= chunk_size:
+            yield ndjson_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield ndjson_chunk(chunk)
+
 # ✅ GET ALL STATIONS
-@router.get("/", response_model=list[StationOut])
-def list_stations(db: Session = Depends(get_db)):
+@router.get("/", response_model=list[StationOut], response_class=FastJSONResponse)
+def list_stations(
+    request: Request,
+    response: Response,
+    open_now: bool = Query(False, description="Only stations open right now"),
+    open_at: Optional[datetime] = Query(None, description="Only stations open at this time"),
+    stream: bool = Query(False, description="Stream the list as NDJSON"),
+    db: Session = Depends(get_db)
+):
     try:
-        stations = db.query(ChargingStation).all()
+        stream = stream or "application/x-ndjson" in request.headers.get("accept", "")
+        now = datetime.now()
+        
+        if stream:
+            # Rows come straight from the database and the snapshot is never loaded,
+            # so the tag uses the clock minute for is_open instead of the open set
+            variant = f"{now:%Y%m%d%H%M}:{slots_version()}{request.query_params}ndjson"
+            etag = make_etag("stations", catalog_version(), variant)
+            cached = not_modified(request, response, etag)
+            if cached:
+                return cached
+            return StreamingResponse(
+                stream_stations(now, open_at or (now if open_now else None)),
+                media_type="application/x-ndjson",
+                headers={"ETag": etag}
+            )
+        
+        # is_open depends on the clock, so the tag follows the set of open stations,
+        # and the slots version, so it changes whenever a free slot is taken or given back.
+        # Both are read before the counts, so a concurrent booking can only make the tag older.
+        catalog = get_catalog(db)
+        open_ids = catalog.open_hours.open_at(now)
+        variant = f"{hash(open_ids)}:{slots_version()}{request.query_params}"
+        etag = make_etag("stations", catalog.version, variant)
+        cached = not_modified(request, response, etag)
+        if cached:
+            return cached
+        
+        stations = catalog.stations
+        if open_at is not None:
+            open_then = catalog.open_hours.open_at(open_at)
+            stations = [s for s in stations if s.id in open_then]
+        elif open_now:
+            stations = [s for s in stations if s.id in open_ids]
+        
+        slots = station_slots(db)
         result = []
         for s in stations:
-            station_data = StationOut(
-                id=s.id,
-                name=s.name,
-                address=s.address,
-                latitude=s.latitude,
-                longitude=s.longitude,
-                phone=s.phone,
-                available_slots=s.available_slots,
-                opening_time=s.opening_time,
-                closing_time=s.closing_time,
-                is_open=is_station_open(s.opening_time, s.closing_time)
-            )
+            station_data = station_json(s, s.id in open_ids, slots.get(s.id, 0))
             result.append(station_data)
-        return result
+        return FastJSONResponse(result, headers=response_headers(response))
     except Exception as e:
         print(f"Error fetching stations: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching stations: {str(e)}")
 
 # ✅ FIND NEARBY STATIONS (must be before /{station_id} to avoid path conflict)
-@router.post("/nearby", response_model=list[dict])
-def nearby_stations(request: NearbyRequest, db: Session = Depends(get_db)):
+@router.post("/nearby", response_model=list[dict], response_class=FastJSONResponse)
+def nearby_stations(
+    request: NearbyRequest,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     try:
         # Accept both lat/lon and latitude/longitude parameter names
         user_lat = request.latitude if request.latitude is not None else request.lat
@@ -84,57 +179,192 @@ def nearby_stations(request: NearbyRequest, db: Session = Depends(get_db)):
         if user_lat is None or user_lon is None:
             raise HTTPException(status_code=400, detail="latitude/longitude or lat/lon required")
         
-        stations = db.query(ChargingStation).all()
+        after = decode_nearby_cursor(request.cursor) if request.cursor else None
+        
+        open_ids = None
+        if request.open_at is not None or request.open_now:
+            open_ids = get_catalog(db).open_hours.open_at(request.open_at)
+        
+        if peek_catalog() is None:
+            # Load the catalog after the response; this request is served from SQL
+            background_tasks.add_task(get_catalog)
+        
+        # Top-k selection over the candidates; only the returned rows are loaded
+        stations, has_more = nearest_stations(db, user_lat, user_lon, request.radius_km, request.k, after, open_ids)
+        slots = station_slots(db, [s.id for s, _ in stations])
+        start = request.open_at or datetime.now()
+        prices = get_tariffs(db).quote([s for s, _ in stations], start.hour, request.hours).tolist()
         nearby = []
         
-        for station in stations:
-            if station.latitude and station.longitude:
-                dist = distance_km(user_lat, user_lon, station.latitude, station.longitude)
-                if dist <= 10:  # Within 10 km
-                    station_dict = {
-                        "id": station.id,
-                        "name": station.name,
-                        "address": station.address,
-                        "latitude": station.latitude,
-                        "longitude": station.longitude,
-                        "distance": dist,
-                        "available_slots": station.available_slots,
-                        "phone": station.phone
-                    }
-                    nearby.append(station_dict)
-        
-        return sorted(nearby, key=lambda x: x["distance"])
+        for (station, dist), price in zip(stations, prices):
+            station_dict = {
+                "id": station.id,
+                "name": station.name,
+                "address": station.address,
+                "latitude": station.latitude,
+                "longitude": station.longitude,
+                "distance": dist,
+                "available_slots": slots.get(station.id, 0),
+                "phone": station.phone,
+                "price": price
+            }
+            nearby.append(station_dict)
+        
+        # The body stays a plain list; the next page is advertised in a header
+        if has_more and nearby:
+            last = nearby[-1]
+            response.headers["X-Next-Cursor"] = encode_nearby_cursor(last["distance"], last["id"])
+        
+        return FastJSONResponse(nearby, headers=response_headers(response))
     except HTTPException:
         raise
     except Exception as e:
         print(f"Error finding nearby stations: {e}")
         raise HTTPException(status_code=500, detail=f"Error finding nearby stations: {str(e)}")
 
+# ✅ FIND STATIONS WITH FREE CAPACITY FOR A TIME WINDOW (must be before /{station_id})
+@router.get("/availability", response_model=list[dict], response_class=FastJSONResponse)
+def find_available_stations(
+    lat: float,
+    lon: float,
+    start: datetime,
+    hours: int = Query(1, ge=1, le=MAX_BOOKING_HOURS),
+    radius_km: float = Query(10, gt=0, le=500),
+    k: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db)
+):
+    """
+    Stations open for the whole window that can take a booking for it,
+    nearest first, with the price of the window. Occupancy of all candidates
+    is read in one query from the capacity calendar, which holds timed and
+    immediate bookings alike, and all prices are quoted in one call.
+    """
+    try:
+        catalog = get_catalog(db)
+        candidates, _ = nearest_stations(
+            db, lat, lon, radius_km, MAX_AVAILABILITY_CANDIDATES,
+            only_ids=catalog.open_hours.open_throughout(start, start + timedelta(hours=hours))
+        )
+        usage = peak_usage_many(db, [s.id for s, _ in candidates], start.date(), start.time(), hours)
+        
+        candidates = [
+            (station, dist) for station, dist in candidates
+            if station_capacity(station) > usage.get(station.id, 0)
+        ][:k]
+        prices = get_tariffs(db).quote([s for s, _ in candidates], start.hour, hours).tolist()
+        
+        options = []
+        for (station, dist), price in zip(candidates, prices):
+            capacity = station_capacity(station)
+            options.append({
+                "id": station.id,
+                "name": station.name,
+                "address": station.address,
+                "latitude": station.latitude,
+                "longitude": station.longitude,
+                "distance": dist,
+                "phone": station.phone,
+                "capacity": capacity,
+                "free": capacity - usage.get(station.id, 0),
+                "price": price
+            })
+        return FastJSONResponse(options)
+    except Exception as e:
+        print(f"Error finding available stations: {e}")
+        raise HTTPException(status_code=500, detail=f"Error finding available stations: {str(e)}")
+
+# ✅ LIVE FREE SLOT COUNTS (never cached; must be before /{station_id})
+@router.get("/slots", response_model=dict[int, int], response_class=FastJSONResponse)
+def get_station_slots(
+    ids: Optional[str] = Query(None, description="Comma-separated station ids; all stations when omitted"),
+    db: Session = Depends(get_db)
+):
+    """Free immediate slots per station id, read straight from the database"""
+    try:
+        station_ids = [int(i) for i in ids.split(",") if i.strip()] if ids else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    
+    try:
+        return FastJSONResponse({str(k): v for k, v in station_slots(db, station_ids).items()})
+    except Exception as e:
+        print(f"Error fetching station slots: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching station slots: {str(e)}")
+
+# ✅ GET MANY STATIONS BY ID (must be before /{station_id} to avoid path conflict)
+def lookup_stations(ids: list[int], db: Session) -> list[dict]:
+    """Stations in request order; unknown ids are skipped"""
+    catalog = get_catalog(db)
+    open_ids = catalog.open_hours.open_at()
+    ids = [i for i in ids if i in catalog.by_id]
+    slots = station_slots(db, ids)
+    return [station_json(catalog.by_id[i], i in open_ids, slots.get(i, 0)) for i in ids]
+
+@router.get("/batch", response_model=list[StationOut], response_class=FastJSONResponse)
+def get_stations_batch(ids: str = Query(..., description="Comma-separated station ids"), db: Session = Depends(get_db)):
+    try:
+        station_ids = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(station_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per GET; use POST /stations/batch")
+    
+    try:
+        return FastJSONResponse(lookup_stations(station_ids, db))
+    except Exception as e:
+        print(f"Error fetching stations: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching stations: {str(e)}")
+
+@router.post("/batch", response_model=list[StationOut], response_class=FastJSONResponse)
+def post_stations_batch(request: StationBatchRequest, db: Session = Depends(get_db)):
+    try:
+        return FastJSONResponse(lookup_stations(request.ids, db))
+    except Exception as e:
+        print(f"Error fetching stations: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching stations: {str(e)}")
+
 # ✅ GET STATION BY ID
-@router.get("/{station_id}", response_model=StationOut)
+@router.get("/{station_id}", response_model=StationOut, response_class=FastJSONResponse)
 def get_station(station_id: int, db: Session = Depends(get_db)):
     try:
-        station = db.query(ChargingStation).filter(ChargingStation.id == station_id).first()
+        station = get_catalog(db).by_id.get(station_id)
         if not station:
             raise HTTPException(status_code=404, detail="Station not found")
-        return StationOut(
-            id=station.id,
-            name=station.name,
-            address=station.address,
-            latitude=station.latitude,
-            longitude=station.longitude,
-            phone=station.phone,
-            available_slots=station.available_slots,
-            opening_time=station.opening_time,
-            closing_time=station.closing_time,
-            is_open=is_station_open(station.opening_time, station.closing_time)
-        )
+        is_open = is_station_open(station.opening_time, station.closing_time)
+        return FastJSONResponse(station_json(station, is_open, station_slots(db, [station_id]).get(station_id, 0)))
     except HTTPException:
         raise
     except Exception as e:
         print(f"Error fetching station: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching station: {str(e)}")
 
+# ✅ FREE CAPACITY OF A STATION FOR A BOOKING WINDOW
+@router.get("/{station_id}/availability")
+def get_station_availability(
+    station_id: int,
+    date: date,
+    start: time,
+    hours: int = Query(1, ge=1, le=MAX_BOOKING_HOURS),
+    db: Session = Depends(get_db)
+):
+    try:
+        station = get_catalog(db).by_id.get(station_id)
+        if not station:
+            raise HTTPException(status_code=404, detail="Station not found")
+        capacity = station_capacity(station)
+        in_use = peak_usage(db, station_id, date, start, hours)
+        return {
+            "station_id": station_id,
+            "capacity": capacity,
+            "in_use": in_use,
+            "free": max(capacity - in_use, 0)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error fetching availability: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching availability: {str(e)}")
+
 # ✅ ADD NEW STATION (Admin only)
 @router.post("/", response_model=StationOut)
 def add_station(station: StationCreate, db: Session = Depends(get_db)):
@@ -150,12 +380,14 @@ def add_station(station: StationCreate, db: Session = Depends(get_db)):
             longitude=station.longitude,
             phone=station.phone,
             available_slots=station.available_slots,
+            capacity=station.capacity if station.capacity is not None else station.available_slots,
             opening_time=station.opening_time,
             closing_time=station.closing_time
         )
         db.add(new_station)
         db.commit()
         db.refresh(new_station)
+        invalidate_catalog()
         
         return StationOut(
             id=new_station.id,
@@ -165,6 +397,7 @@ def add_station(station: StationCreate, db: Session = Depends(get_db)):
             longitude=new_station.longitude,
             phone=new_station.phone,
             available_slots=new_station.available_slots,
+            capacity=new_station.capacity,
             opening_time=new_station.opening_time,
             closing_time=new_station.closing_time
         )
@@ -174,3 +407,34 @@ def add_station(station: StationCreate, db: Session = Depends(get_db)):
         db.rollback()
         print(f"Error adding station: {e}")
         raise HTTPException(status_code=400, detail=f"Error adding station: {str(e)}")
+
+# ✅ BULK IMPORT STATIONS FROM CSV / NDJSON (Admin only)
+@router.post("/import")
+async def import_stations(
+    request: Request,
+    format: str = Query(None, pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=10000),
+    admin_id: int = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream a CSV (with header) or NDJSON request body into charging_stations.
+    Returns the number of rows inserted and the errors of rejected rows by line.
+    """
+    fmt = format or ("ndjson" if "ndjson" in request.headers.get("content-type", "") else "csv")
+    importer = StationImporter(db, batch_size)
+    header = None
+    line_no = 0
+    try:
+        async for line in iter_lines(request.stream()):
+            line_no += 1
+            try:
+                row, header = parse_line(fmt, line, header)
+            except ValueError as e:
+                importer.error(line_no, str(e))
+                continue
+            if row is not None and importer.add(line_no, row):
+                await run_in_threadpool(importer.flush)
+    finally:
+        await run_in_threadpool(importer.finish)
+    return importer.summary()
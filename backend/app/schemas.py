@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from datetime import datetime, date as Date, time
 from typing import Optional, List
 
 # ===== USER SCHEMAS =====
@@ -82,6 +82,7 @@ class StationCreate(BaseModel):
     charging_type: str = "AC"
     phone: Optional[str] = None
     available_slots: int = 5
+    capacity: Optional[int] = None  # Chargers in total; defaults to available_slots
     opening_time: Optional[str] = None
     closing_time: Optional[str] = None
 
@@ -97,20 +98,31 @@ class StationOut(StationCreate):
 class BookingCreate(BaseModel):
     station_id: int
     company_id: Optional[int] = None
+    user_id: Optional[int] = None
     name: str
     car_number: str
     phone: str
     hours: int
+    # Both set: book this window against the station's capacity calendar
+    date: Optional[Date] = None
+    booking_start_time: Optional[time] = None
 
 class BookingOut(BookingCreate):
     id: int
     status: str
-    user_id: int = None
+    amount: Optional[int] = None  # ₹, priced by the server from the tariffs
+    hold_expires_at: Optional[datetime] = None  # Pay before this or the booking expires
+    ends_at: Optional[datetime] = None
+    refund_due: Optional[int] = None  # Set when a paid booking is cancelled
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class BookingHistoryOut(BookingOut):
+    station_name: Optional[str] = None
+    payment_status: str  # 'paid' once payments cover the amount, 'partial' before that, else 'unpaid'
+
 
 # ===== PAYMENT SCHEMAS =====
 class PaymentCreate(BaseModel):
@@ -80,6 +80,9 @@ def seed_stations():
         ),
     ]
     
+    for station in stations:
+        station.capacity = station.available_slots
+    
     try:
         db.add_all(stations)
         db.commit()
@@ -71,3 +71,12 @@ def get_user_by_email(db: Session, email: str) -> models.User:
 def get_user_by_id(db: Session, user_id: int) -> models.User:
     """Get user by ID"""
     return db.query(models.User).filter(models.User.id == user_id).first()
+
+
+def user_id_from_token(token: str) -> int:
+    """User id carried by a token from generate_token; raises ValueError if malformed"""
+    try:
+        decoded = base64.b64decode(token.encode()).decode()
+        return int(decoded.split(':')[0])
+    except Exception:
+        raise ValueError("Invalid token")
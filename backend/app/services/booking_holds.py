@@ -0,0 +1,139 @@
+"""
+Booking Holds Service - Unpaid bookings hold capacity only for a limited time
+
+A new booking is created 'pending' with hold_expires_at set HOLD_TTL ahead.
+Paying clears the hold. A background sweeper keeps a heap of upcoming
+expiry times, sleeps until the earliest one and then expires every due hold
+in batches: one UPDATE marks a batch 'expired' and its capacity is
+released the same way as for cancellations, in the same transaction.
+
+Each wake-up sweeps every due hold in the database, not only the ones in
+this process's heap, and the sweeper never sleeps longer than MAX_SLEEP,
+so holds created by other workers are expired too.
+"""
+import heapq
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from .. import models
+from ..database import SessionLocal
+from .booking_lifecycle import RELEASE_COLUMNS, release_capacity, slots_released
+
+HOLD_TTL = timedelta(minutes=int(os.getenv("BOOKING_HOLD_MINUTES", "15")))
+MAX_SLEEP = 60  # Seconds between sweeps when no local hold is due sooner
+BATCH_SIZE = 500
+
+
+def hold_expiry(now: datetime = None) -> datetime:
+    return (now or datetime.utcnow()) + HOLD_TTL
+
+
+def expire_due_holds(db, now: datetime = None, batch_size: int = BATCH_SIZE) -> int:
+    """Expire one batch of unpaid holds that are past due; returns how many"""
+    Booking = models.Booking
+    now = now or datetime.utcnow()
+    due = [
+        booking_id for booking_id, in db.query(Booking.id).filter(
+            Booking.status == "pending",
+            Booking.hold_expires_at <= now
+        ).order_by(Booking.hold_expires_at).limit(batch_size)
+    ]
+    if not due:
+        return 0
+
+    # The status check again here skips bookings paid since the SELECT
+    expired = db.execute(
+        update(Booking)
+        .where(Booking.id.in_(due), Booking.status == "pending")
+        .values(status="expired", hold_expires_at=None)
+        .returning(*RELEASE_COLUMNS)
+    ).all()
+
+    released = release_capacity(db, expired)
+    db.commit()
+    slots_released(released)
+    return len(expired)
+
+
+class HoldSweeper:
+    """Background thread expiring holds as they come due"""
+
+    def __init__(self):
+        self._heap = []  # (expires_at, booking_id)
+        self._wakeup = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def schedule(self, booking_id: int, expires_at: datetime):
+        with self._wakeup:
+            heapq.heappush(self._heap, (expires_at, booking_id))
+            if self._heap[0][1] == booking_id:
+                self._wakeup.notify()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._load_pending()
+        self._thread = threading.Thread(target=self._run, name="booking-hold-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _load_pending(self):
+        db = SessionLocal()
+        try:
+            rows = db.query(models.Booking.hold_expires_at, models.Booking.id).filter(
+                models.Booking.status == "pending",
+                models.Booking.hold_expires_at.isnot(None)
+            ).all()
+        finally:
+            db.close()
+        with self._wakeup:
+            self._heap = [tuple(row) for row in rows]
+            heapq.heapify(self._heap)
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+                timeout = MAX_SLEEP
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+                if timeout > 0:
+                    self._wakeup.wait(timeout)
+                    if self._stopping:
+                        return
+                now = datetime.utcnow()
+                while self._heap and self._heap[0][0] <= now:
+                    heapq.heappop(self._heap)
+            self.sweep(now)
+
+    def sweep(self, now: datetime = None) -> int:
+        db = SessionLocal()
+        total = 0
+        try:
+            while True:
+                expired = expire_due_holds(db, now)
+                total += expired
+                if expired < BATCH_SIZE:
+                    break
+            if total:
+                print(f"[HOLDS] Expired {total} unpaid booking(s)")
+        except Exception as e:
+            db.rollback()
+            print(f"Error expiring booking holds: {e}")
+        finally:
+            db.close()
+        return total
+
+
+hold_sweeper = HoldSweeper()
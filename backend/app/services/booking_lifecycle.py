@@ -0,0 +1,286 @@
+"""
+Booking Lifecycle Service - Cancellation, completion and capacity release
+
+Bookings move pending -> confirmed (paid) -> completed, and can be cancelled
+while pending or confirmed. Leaving the active states gives the booking's
+capacity back: every booking releases its calendar window, and an
+immediate booking also returns its slot to available_slots.
+
+Cancelling never deletes payments. A booking cancelled after it was paid
+keeps its payments and records their total in refund_due, the amount owed
+back to the customer; the refund itself is settled outside this service.
+
+Every transition is one conditional UPDATE ... RETURNING, so concurrent
+callers can never release the same booking twice, and the returned rows
+feed set-based releases without loading any Booking objects. A background
+scheduler completes finished bookings (ends_at passed) in batches.
+"""
+import threading
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import SessionLocal
+from .capacity_calendar import MAX_BOOKING_HOURS, occupy_window, release_window
+from .station_catalog import invalidate_catalog, slots_changed
+
+ACTIVE_STATUSES = ("pending", "confirmed", "paid")
+PAID_STATUSES = ("confirmed", "paid")
+COMPLETION_INTERVAL = 60  # Seconds between auto-completion runs
+BATCH_SIZE = 1000
+
+Booking = models.Booking
+RELEASE_COLUMNS = (
+    Booking.id, Booking.station_id, Booking.date, Booking.booking_start_time, Booking.hours, Booking.ends_at
+)
+
+
+class BookingNotFound(Exception):
+    pass
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+def booking_end(day: Optional[date], start_time: Optional[time], hours: int, now: datetime = None) -> datetime:
+    """When charging ends: the booked window for timed bookings, `hours` from now otherwise"""
+    if day is not None and start_time is not None:
+        start = datetime.combine(day, start_time)
+    else:
+        start = now or datetime.now()
+    return start + timedelta(hours=hours or 0)
+
+
+def restore_station_slots(db: Session, station_ids):
+    """Give one available slot back per entry of station_ids in a single UPDATE"""
+    counts = Counter(station_ids)
+    if not counts:
+        return
+    Station = models.ChargingStation
+    db.execute(
+        update(Station)
+        .where(Station.id.in_(counts))
+        .values(available_slots=Station.available_slots + case(counts, value=Station.id, else_=0))
+    )
+
+
+def release_capacity(db: Session, rows, windows: bool = True) -> list:
+    """
+    Give back the capacity of bookings given as RELEASE_COLUMNS rows. Calendar
+    windows are skipped with windows=False (e.g. for bookings already over).
+    Does not commit; returns the ids of stations that got slots back, to be
+    passed to slots_released() after the commit.
+    """
+    immediate = [row.station_id for row in rows if row.booking_start_time is None]
+    restore_station_slots(db, immediate)
+    if windows:
+        for row in rows:
+            window = booking_window(row)
+            if window is not None:
+                release_window(db, row.station_id, *window, row.hours)
+    return sorted(set(immediate))
+
+
+_release_listeners = []
+
+
+def on_slots_released(listener):
+    """Register listener(station_ids), called after slots are given back (e.g. the waitlist)"""
+    _release_listeners.append(listener)
+    return listener
+
+
+def slots_released(station_ids):
+    """Call after committing a release_capacity() that returned station ids"""
+    if not station_ids:
+        return
+    slots_changed()
+    for listener in _release_listeners:
+        try:
+            listener(station_ids)
+        except Exception as e:
+            print(f"Error handling released slots: {e}")
+
+
+def booking_window(row):
+    """(day, start_time) a booking's calendar window starts at, or None if unknown"""
+    if row.booking_start_time is not None:
+        return row.date, row.booking_start_time
+    if row.ends_at is not None:
+        # Immediate bookings hold the window from when they were made
+        start = row.ends_at - timedelta(hours=row.hours)
+        return start.date(), start.time()
+    return None
+
+
+def backfill_booking_dates():
+    """
+    Give bookings stored without a date the day they were made, once, so
+    booking history can sort and page on (date, id). Runs at startup.
+    """
+    db = SessionLocal()
+    try:
+        filled = db.execute(
+            update(Booking)
+            .where(Booking.date.is_(None))
+            .values(date=func.coalesce(func.date(Booking.created_at), func.current_date()))
+        ).rowcount
+        db.commit()
+        if filled:
+            print(f"[OK] Set the date of {filled} booking(s) made without one")
+    finally:
+        db.close()
+
+
+def backfill_station_capacity(now: datetime = None):
+    """
+    Bring stations from before the capacity calendar into it, once: set
+    capacity to the slots still free plus those held by active immediate
+    bookings, and count the windows of their active bookings that have not
+    ended yet in the calendar. Immediate bookings made before ends_at was
+    recorded have no known window and stay out of it. Runs at startup.
+    """
+    now = now or datetime.now()
+    Station = models.ChargingStation
+    db = SessionLocal()
+    try:
+        station_ids = [station_id for station_id, in db.query(Station.id).filter(Station.capacity.is_(None))]
+        if not station_ids:
+            return
+
+        held = select(func.count(Booking.id)).where(
+            Booking.station_id == Station.id,
+            Booking.status.in_(ACTIVE_STATUSES),
+            Booking.booking_start_time.is_(None)
+        ).scalar_subquery()
+        db.execute(
+            update(Station)
+            .where(Station.id.in_(station_ids), Station.capacity.is_(None))
+            .values(capacity=func.coalesce(Station.available_slots, 0) + held)
+        )
+
+        active = db.query(*RELEASE_COLUMNS).filter(
+            Booking.station_id.in_(station_ids),
+            Booking.status.in_(ACTIVE_STATUSES),
+            Booking.hours.between(1, MAX_BOOKING_HOURS)
+        ).yield_per(BATCH_SIZE)
+        counted = 0
+        for row in active:
+            window = booking_window(row)
+            if window is None or datetime.combine(*window) + timedelta(hours=row.hours) <= now:
+                continue
+            occupy_window(db, row.station_id, *window, row.hours)
+            counted += 1
+        db.commit()
+        invalidate_catalog()
+        print(f"[OK] Set capacity on {len(station_ids)} station(s), {counted} active booking(s) added to the calendar")
+    finally:
+        db.close()
+
+
+def _transition(db: Session, booking_id: int, from_statuses, to_status: str, windows: bool = True, **values):
+    row = db.execute(
+        update(Booking)
+        .where(Booking.id == booking_id, Booking.status.in_(from_statuses))
+        .values(status=to_status, hold_expires_at=None, **values)
+        .returning(*RELEASE_COLUMNS)
+    ).first()
+    if row is None:
+        db.rollback()
+        status = db.query(Booking.status).filter(Booking.id == booking_id).scalar()
+        if status is None:
+            raise BookingNotFound()
+        raise InvalidTransition(f"Cannot change a {status} booking to {to_status}")
+
+    released = release_capacity(db, [row], windows)
+    db.commit()
+    slots_released(released)
+
+
+def cancel_booking(db: Session, booking_id: int):
+    # Whatever was paid is owed back; NULL when nothing was
+    paid = select(func.nullif(func.coalesce(func.sum(models.Payment.amount), 0), 0)).where(
+        models.Payment.booking_id == Booking.id
+    ).scalar_subquery()
+    _transition(db, booking_id, ACTIVE_STATUSES, "cancelled", refund_due=paid)
+
+
+def complete_booking(db: Session, booking_id: int):
+    # Finishing early frees the rest of the window too
+    _transition(db, booking_id, PAID_STATUSES, "completed")
+
+
+def complete_finished_bookings(db: Session, now: datetime = None, batch_size: int = BATCH_SIZE) -> int:
+    """Complete one batch of paid bookings whose ends_at has passed; returns how many"""
+    now = now or datetime.now()
+    due = [
+        booking_id for booking_id, in db.query(Booking.id).filter(
+            Booking.status.in_(PAID_STATUSES),
+            Booking.ends_at <= now
+        ).limit(batch_size)
+    ]
+    if not due:
+        return 0
+
+    completed = db.execute(
+        update(Booking)
+        .where(Booking.id.in_(due), Booking.status.in_(PAID_STATUSES))
+        .values(status="completed")
+        .returning(*RELEASE_COLUMNS)
+    ).all()
+    # Their calendar windows are already in the past
+    released = release_capacity(db, completed, windows=False)
+    db.commit()
+    slots_released(released)
+    return len(completed)
+
+
+class CompletionScheduler:
+    """Background thread completing finished bookings every COMPLETION_INTERVAL seconds"""
+
+    def __init__(self, interval: float = COMPLETION_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="booking-completion", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def run_once(self, now: datetime = None) -> int:
+        db = SessionLocal()
+        total = 0
+        try:
+            while not self._stop.is_set():
+                completed = complete_finished_bookings(db, now)
+                total += completed
+                if completed < BATCH_SIZE:
+                    break
+            if total:
+                print(f"[BOOKINGS] Completed {total} finished booking(s)")
+        except Exception as e:
+            db.rollback()
+            print(f"Error completing bookings: {e}")
+        finally:
+            db.close()
+        return total
+
+
+completion_scheduler = CompletionScheduler()
@@ -1,12 +1,272 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import func, insert, select, tuple_, update
 from sqlalchemy.orm import Session
 from .. import models
+from .capacity_calendar import reserve_window, station_capacity
+from .booking_holds import hold_expiry, hold_sweeper
+from .booking_lifecycle import booking_end
+from .station_catalog import slots_changed
+from .tariffs import get_tariffs, price_booking, start_hour
+from ..utils.time_utils import is_open_throughout
+
+
+class StationNotFound(Exception):
+    pass
+
+
+class NoSlotsAvailable(Exception):
+    pass
+
+
+class InvalidBookingWindow(Exception):
+    pass
+
+
+def check_booking_window(station, day, start_time, hours: int, now: datetime):
+    """Raise InvalidBookingWindow unless the window starts in the future and the station is open throughout"""
+    start = datetime.combine(day, start_time)
+    if start < now:
+        raise InvalidBookingWindow("The booking window has already started")
+    if not is_open_throughout(station.opening_time, station.closing_time, start, start + timedelta(hours=hours)):
+        raise InvalidBookingWindow("The station is closed during the booking window")
+
+
+def reserve_slot(db: Session, station_id: int, hours: int, start: datetime, count: int = 1) -> bool:
+    """
+    Take `count` free slots with a single conditional UPDATE, so concurrent
+    bookings can never drive available_slots below zero, and hold the chargers
+    from `start` for `hours` in the capacity calendar, so timed bookings see
+    them in use. Does not commit; on False the caller must roll back.
+    """
+    Station = models.ChargingStation
+    taken = db.execute(
+        update(Station)
+        .where(Station.id == station_id, Station.available_slots >= count)
+        .values(available_slots=Station.available_slots - count)
+        .returning(Station.capacity)
+    ).first()
+    if taken is None:
+        return False
+    return reserve_window(db, station_id, station_capacity(taken), start.date(), start.time(), hours, count)
+
+
+def reserve_timed_slot(db: Session, data, now: datetime) -> bool:
+    """Take one charger for the booked window from the station's capacity calendar"""
+    Station = models.ChargingStation
+    station = db.query(Station.capacity, Station.opening_time, Station.closing_time).filter(
+        Station.id == data.station_id
+    ).first()
+    if not station:
+        raise StationNotFound()
+    check_booking_window(station, data.date, data.booking_start_time, data.hours, now)
+    return reserve_window(
+        db, data.station_id, station_capacity(station),
+        data.date, data.booking_start_time, data.hours
+    )
+
 
 def create_booking(db: Session, data):
+    """
+    Reserve capacity and insert the booking in the same transaction.
+    Bookings with a date and start time draw on the capacity calendar and
+    must be in the future and within opening hours (InvalidBookingWindow);
+    the rest take one of the station's available slots right away and
+    hold the calendar from now on.
+    Either way the capacity is only held until the booking is paid
+    or its hold expires. The amount comes from the tariffs, never the client.
+    """
+    timed = data.date is not None and data.booking_start_time is not None
+    now = datetime.now()
+    if timed:
+        if not reserve_timed_slot(db, data, now):
+            db.rollback()
+            raise NoSlotsAvailable()
+    elif not reserve_slot(db, data.station_id, data.hours, now):
+        db.rollback()
+        station = db.query(models.ChargingStation.id).filter(
+            models.ChargingStation.id == data.station_id
+        ).first()
+        if not station:
+            raise StationNotFound()
+        raise NoSlotsAvailable()
+
     booking = models.Booking(**data.dict())
+    if booking.date is None:
+        booking.date = now.date()
+    booking.hold_expires_at = hold_expiry()
+    booking.ends_at = booking_end(data.date, data.booking_start_time, data.hours, now)
+    booking.amount = price_booking(db, data)
     db.add(booking)
     db.commit()
+    if not timed:
+        slots_changed()
     db.refresh(booking)
+    hold_sweeper.schedule(booking.id, booking.hold_expires_at)
     return booking
 
-def get_bookings(db: Session):
-    return db.query(models.Booking).all()
+
+def create_bookings_bulk(db: Session, items) -> list:
+    """
+    Book many vehicles in one transaction. Stations are validated with one
+    query; each group of immediate bookings for the same station and
+    duration takes its slots and window once, and so does each group of
+    identical timed bookings, so every group either gets all its capacity
+    or none of it. Accepted bookings are inserted with one executemany.
+    Returns one {"index", "status", ...} result per item, in order.
+    """
+    Station = models.ChargingStation
+    results = [None] * len(items)
+
+    station_ids = {item.station_id for item in items}
+    stations = {
+        row.id: row for row in db.query(
+            Station.id, Station.charging_type, Station.capacity, Station.opening_time, Station.closing_time
+        ).filter(Station.id.in_(station_ids))
+    }
+
+    now = datetime.now()
+    immediate = defaultdict(list)  # (station_id, hours) -> item indexes
+    timed = defaultdict(list)  # (station_id, date, start, hours) -> item indexes
+    for i, item in enumerate(items):
+        if item.station_id not in stations:
+            results[i] = {"index": i, "status": "failed", "error": "Station not found"}
+        elif item.date is not None and item.booking_start_time is not None:
+            try:
+                check_booking_window(stations[item.station_id], item.date, item.booking_start_time, item.hours, now)
+            except InvalidBookingWindow as e:
+                results[i] = {"index": i, "status": "failed", "error": str(e)}
+                continue
+            timed[(item.station_id, item.date, item.booking_start_time, item.hours)].append(i)
+        else:
+            immediate[(item.station_id, item.hours)].append(i)
+
+    accepted = []
+
+    def reserve_group(indexes, reserve, error):
+        # A savepoint undoes slots or a window that only partly fit
+        savepoint = db.begin_nested()
+        try:
+            reserved = reserve()
+        except ValueError as e:
+            reserved, error = False, str(e)
+        if reserved:
+            savepoint.commit()
+            accepted.extend(indexes)
+        else:
+            savepoint.rollback()
+            for i in indexes:
+                results[i] = {"index": i, "status": "failed", "error": error}
+
+    for (station_id, hours), indexes in immediate.items():
+        reserve_group(
+            indexes,
+            lambda: reserve_slot(db, station_id, hours, now, len(indexes)),
+            "Not enough free slots at this station"
+        )
+
+    for (station_id, day, start, hours), indexes in timed.items():
+        reserve_group(
+            indexes,
+            lambda: reserve_window(
+                db, station_id, station_capacity(stations[station_id]), day, start, hours, len(indexes)
+            ),
+            "Not enough capacity for this window"
+        )
+
+    accepted.sort()
+    if accepted:
+        expires_at = hold_expiry()
+        amounts = get_tariffs(db).quote(
+            [stations[items[i].station_id] for i in accepted],
+            [start_hour(items[i].date, items[i].booking_start_time) for i in accepted],
+            [items[i].hours for i in accepted]
+        ).tolist()
+        rows = []
+        for i, amount in zip(accepted, amounts):
+            values = items[i].dict()
+            values["date"] = values["date"] or now.date()
+            values["hold_expires_at"] = expires_at
+            values["ends_at"] = booking_end(values["date"], values["booking_start_time"], values["hours"], now)
+            values["amount"] = amount
+            rows.append(values)
+        booking_ids = db.scalars(
+            insert(models.Booking).returning(models.Booking.id, sort_by_parameter_order=True),
+            rows
+        ).all()
+        db.commit()
+        if any(items[i].date is None or items[i].booking_start_time is None for i in accepted):
+            slots_changed()
+        for i, booking_id in zip(accepted, booking_ids):
+            hold_sweeper.schedule(booking_id, expires_at)
+            results[i] = {"index": i, "status": "booked", "booking_id": booking_id}
+    else:
+        db.rollback()
+    return results
+
+
+def get_bookings(
+    db: Session,
+    limit: int,
+    after: Optional[tuple] = None,
+    station_id: Optional[int] = None,
+    company_id: Optional[int] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+):
+    """
+    One page of bookings, newest first, plus a flag telling whether more remain.
+    `after` is the (created_at, id) of the last booking already returned; the
+    page is read by seeking to it in the ix_bookings_*_created_id indexes, so
+    every page costs the same however deep it is.
+    """
+    Booking = models.Booking
+    query = db.query(Booking)
+    if station_id is not None:
+        query = query.filter(Booking.station_id == station_id)
+    if company_id is not None:
+        query = query.filter(Booking.company_id == company_id)
+    if status is not None:
+        query = query.filter(Booking.status == status)
+    if created_from is not None:
+        query = query.filter(Booking.created_at >= created_from)
+    if created_to is not None:
+        query = query.filter(Booking.created_at < created_to)
+    if after is not None:
+        query = query.filter(tuple_(Booking.created_at, Booking.id) < tuple_(*after))
+
+    rows = query.order_by(Booking.created_at.desc(), Booking.id.desc()).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def payment_status(amount: Optional[int], paid: int) -> str:
+    """'paid' once the payments cover the amount, 'partial' before that, else 'unpaid'"""
+    if not paid:
+        return "unpaid"
+    # Bookings made before server-side pricing have no amount; any payment settles them
+    if amount is None or paid >= amount:
+        return "paid"
+    return "partial"
+
+
+def get_user_bookings(db: Session, user_id: int, limit: int, after: Optional[tuple] = None):
+    """
+    One page of a user's bookings, latest booking date first, each as
+    (booking, station_name, amount_paid), plus a flag telling whether more
+    remain. `after` is the (date, id) of the last booking already returned.
+    Station names and payment totals come from the same query.
+    """
+    Booking = models.Booking
+    paid = select(func.coalesce(func.sum(models.Payment.amount), 0)).where(
+        models.Payment.booking_id == Booking.id
+    ).scalar_subquery()
+    query = db.query(Booking, models.ChargingStation.name, paid).outerjoin(
+        models.ChargingStation, models.ChargingStation.id == Booking.station_id
+    ).filter(Booking.user_id == user_id)
+    if after is not None:
+        query = query.filter(tuple_(Booking.date, Booking.id) < tuple_(*after))
+
+    rows = query.order_by(Booking.date.desc(), Booking.id.desc()).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,142 @@
+"""
+Capacity Calendar Service - Per-station booking capacity in 15-minute slots
+
+Each (station, day, slot) row counts the bookings running in that slot,
+timed and immediate alike (an immediate booking holds [now, now + hours)),
+so both kinds share the station's `capacity` chargers.
+Reserving a window is one conditional UPDATE per calendar day over the
+slot range, which only succeeds if every slot still has room, so bookings
+for different times at the same station touch different rows and never
+wait on a shared counter. Lookups are primary-key range scans.
+"""
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from .. import models
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+MAX_BOOKING_HOURS = 24
+
+Usage = models.StationSlotUsage
+
+
+def slot_ranges(day: date, start_time: time, hours: int):
+    """
+    The booking window as (day, first_slot, last_slot) ranges, inclusive,
+    split at midnight. Partial slots count as taken.
+    """
+    if not 1 <= hours <= MAX_BOOKING_HOURS:
+        raise ValueError(f"hours must be between 1 and {MAX_BOOKING_HOURS}")
+    start = datetime.combine(day, start_time)
+    end = start + timedelta(hours=hours)
+
+    ranges = []
+    while start < end:
+        midnight = datetime.combine(start.date(), time())
+        stop = min(end, midnight + timedelta(days=1))
+        first_minute = (start - midnight) // timedelta(minutes=1)
+        stop_minute = (stop - midnight) // timedelta(minutes=1)
+        ranges.append((start.date(), first_minute // SLOT_MINUTES, -(-stop_minute // SLOT_MINUTES) - 1))
+        start = stop
+    return ranges
+
+
+def station_capacity(station) -> int:
+    """Chargers at the station (stations predating the column are backfilled at startup)"""
+    return station.capacity or 0
+
+
+def _ensure_rows(db: Session, station_id: int, ranges):
+    rows = [
+        {"station_id": station_id, "day": day, "slot": slot, "used": 0}
+        for day, first, last in ranges
+        for slot in range(first, last + 1)
+    ]
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    db.execute(insert(Usage).values(rows).on_conflict_do_nothing())
+
+
+def reserve_window(
+    db: Session, station_id: int, capacity: int, day: date, start_time: time, hours: int, count: int = 1
+) -> bool:
+    """
+    Count `count` bookings in every slot of the window if all of them have room.
+    Does not commit; on False the caller must roll back.
+    """
+    ranges = slot_ranges(day, start_time, hours)
+    _ensure_rows(db, station_id, ranges)
+    for day, first, last in ranges:
+        result = db.execute(
+            update(Usage)
+            .where(
+                Usage.station_id == station_id,
+                Usage.day == day,
+                Usage.slot.between(first, last),
+                Usage.used <= capacity - count
+            )
+            .values(used=Usage.used + count)
+        )
+        if result.rowcount != last - first + 1:
+            return False
+    return True
+
+
+def occupy_window(db: Session, station_id: int, day: date, start_time: time, hours: int):
+    """Count a booking that already holds its charger, without a capacity check. Does not commit."""
+    ranges = slot_ranges(day, start_time, hours)
+    _ensure_rows(db, station_id, ranges)
+    for day, first, last in ranges:
+        db.execute(
+            update(Usage)
+            .where(Usage.station_id == station_id, Usage.day == day, Usage.slot.between(first, last))
+            .values(used=Usage.used + 1)
+        )
+
+
+def release_window(db: Session, station_id: int, day: date, start_time: time, hours: int):
+    """Undo reserve_window for a cancelled or expired booking. Does not commit."""
+    for day, first, last in slot_ranges(day, start_time, hours):
+        db.execute(
+            update(Usage)
+            .where(
+                Usage.station_id == station_id,
+                Usage.day == day,
+                Usage.slot.between(first, last),
+                Usage.used > 0
+            )
+            .values(used=Usage.used - 1)
+        )
+
+
+def peak_usage(db: Session, station_id: int, day: date, start_time: time, hours: int) -> int:
+    """Most bookings running at once at any point in the window"""
+    peak = 0
+    for day, first, last in slot_ranges(day, start_time, hours):
+        used = db.query(func.max(Usage.used)).filter(
+            Usage.station_id == station_id,
+            Usage.day == day,
+            Usage.slot.between(first, last)
+        ).scalar()
+        peak = max(peak, used or 0)
+    return peak
+
+
+def peak_usage_many(db: Session, station_ids, day: date, start_time: time, hours: int) -> dict:
+    """
+    peak_usage for many stations in one aggregated query.
+    Stations with nothing booked in the window are missing from the result.
+    """
+    if not station_ids:
+        return {}
+    window = or_(*(
+        and_(Usage.day == day, Usage.slot.between(first, last))
+        for day, first, last in slot_ranges(day, start_time, hours)
+    ))
+    rows = db.query(Usage.station_id, func.max(Usage.used)).filter(
+        Usage.station_id.in_(station_ids),
+        window
+    ).group_by(Usage.station_id).all()
+    return {station_id: used for station_id, used in rows}
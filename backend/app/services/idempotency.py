@@ -0,0 +1,152 @@
+"""
+Idempotency Service - Replay the stored response of a retried request
+
+The first request with a given Idempotency-Key claims it by inserting a row
+with no response; the primary key makes the claim atomic across workers.
+When the request succeeds its response is stored on the row, and retries
+with the same key get that response back instead of running again.
+Completed responses are also kept in a bounded in-process LRU so most
+replays never reach the database. Keys expire after IDEMPOTENCY_TTL.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .. import models
+
+IDEMPOTENCY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+CLAIM_TIMEOUT = timedelta(minutes=5)  # A claim with no response after this was abandoned
+LRU_SIZE = 10000
+PURGE_EVERY = 1000  # Claims between deletions of expired keys
+
+Record = models.IdempotencyRecord
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request"""
+
+
+class IdempotencyInProgress(Exception):
+    """The first request with this key has not finished yet"""
+
+
+class StoredResponse(NamedTuple):
+    request_hash: str
+    status_code: int
+    body: str
+    stored_at: datetime
+
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+_claims = 0
+
+
+def request_hash(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _remember(key: str, stored: StoredResponse):
+    with _lock:
+        _lru[key] = stored
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _recall(key: str, now: datetime) -> Optional[StoredResponse]:
+    with _lock:
+        stored = _lru.get(key)
+        if stored is None:
+            return None
+        if stored.stored_at < now - IDEMPOTENCY_TTL:
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        return stored
+
+
+def _replay(stored: StoredResponse, digest: str) -> StoredResponse:
+    if stored.request_hash != digest:
+        raise IdempotencyConflict()
+    return stored
+
+
+def claim(db: Session, key: str, digest: str) -> Optional[StoredResponse]:
+    """
+    Returns the stored response if the key was already used for this request,
+    or None once the caller owns the key and should run the request.
+    """
+    global _claims
+    now = datetime.utcnow()
+    stored = _recall(key, now)
+    if stored is not None:
+        return _replay(stored, digest)
+
+    with _lock:
+        _claims += 1
+        purge = _claims % PURGE_EVERY == 0
+    if purge:
+        purge_expired(db, now)
+
+    try:
+        db.add(Record(key=key, request_hash=digest, created_at=now))
+        db.commit()
+        return None
+    except IntegrityError:
+        db.rollback()
+
+    record = db.get(Record, key)
+    if record is None:
+        raise IdempotencyInProgress()  # Released by the first request a moment ago
+
+    expired = record.created_at < now - IDEMPOTENCY_TTL
+    abandoned = record.status_code is None and record.created_at < now - CLAIM_TIMEOUT
+    if expired or abandoned:
+        # Take the key over, unless another retry got there first
+        taken = db.execute(
+            update(Record)
+            .where(Record.key == key, Record.created_at == record.created_at)
+            .values(request_hash=digest, status_code=None, response_body=None, created_at=now)
+        ).rowcount == 1
+        db.commit()
+        if taken:
+            return None
+        raise IdempotencyInProgress()
+
+    if record.status_code is None:
+        if record.request_hash != digest:
+            raise IdempotencyConflict()
+        raise IdempotencyInProgress()
+
+    stored = StoredResponse(record.request_hash, record.status_code, record.response_body, record.created_at)
+    _remember(key, stored)
+    return _replay(stored, digest)
+
+
+def complete(db: Session, key: str, digest: str, status_code: int, body: str):
+    """Store the response of the request that claimed the key"""
+    record = db.get(Record, key)
+    record.status_code = status_code
+    record.response_body = body
+    db.commit()
+    _remember(key, StoredResponse(digest, status_code, body, record.created_at))
+
+
+def release(db: Session, key: str):
+    """Give the key up after a failed request so a retry runs it again"""
+    db.rollback()
+    db.execute(delete(Record).where(Record.key == key, Record.status_code.is_(None)))
+    db.commit()
+
+
+def purge_expired(db: Session, now: datetime = None):
+    cutoff = (now or datetime.utcnow()) - IDEMPOTENCY_TTL
+    db.execute(delete(Record).where(Record.created_at < cutoff))
+    db.commit()
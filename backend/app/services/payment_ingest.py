@@ -0,0 +1,245 @@
+"""
+Payment Ingest Service - Acknowledge gateway callbacks now, apply them in batches
+
+A callback is written to the payment_callbacks outbox (one small INSERT, no
+booking locks) and its id put on a bounded in-process queue; the gateway is
+answered straight away. A worker thread drains the queue and applies up to
+BATCH_SIZE callbacks per transaction with apply_payment(), so a burst costs
+one lock and one commit per batch instead of per callback. Callbacks a
+payment cannot be applied for (already paid, wrong amount, unknown booking)
+are marked 'rejected' in the same commit.
+
+When the queue is full new callbacks are refused with 503 and Retry-After
+before anything is written, so gateways back off instead of piling up.
+The outbox is the source of truth: callbacks still 'received' (left by a
+restart, another worker, or a lost enqueue) are picked up by a rescan
+every RESCAN_INTERVAL seconds, and a callback is only applied while still
+'received' under the write lock, so it is never applied twice.
+"""
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import SessionLocal
+from .booking_lifecycle import BookingNotFound
+from .payment_service import PaymentRejected, apply_payment, begin_write
+
+QUEUE_SIZE = int(os.getenv("PAYMENT_QUEUE_SIZE", "1000"))
+BATCH_SIZE = 100
+RESCAN_INTERVAL = 5  # Seconds; also how long a callback may sit before a rescan takes it
+
+Callback = models.PaymentCallback
+
+
+class IngestBusy(Exception):
+    """The queue is full; the callback was not accepted"""
+
+
+def apply_callbacks(db: Session, callback_ids) -> Counter:
+    """Apply the still-received callbacks among callback_ids in one transaction; returns outcome counts"""
+    begin_write(db)
+    query = db.query(Callback).filter(
+        Callback.id.in_(callback_ids),
+        Callback.status == "received"
+    ).order_by(Callback.booking_id, Callback.id)  # One lock order for every worker
+    if db.get_bind().dialect.name != "sqlite":
+        query = query.with_for_update(skip_locked=True)
+
+    outcomes = Counter()
+    now = datetime.utcnow()
+    for callback in query.all():
+        try:
+            payment = apply_payment(db, callback.booking_id, callback.amount, callback.phone)
+            callback.status, callback.payment_id = "applied", payment.id
+        except BookingNotFound:
+            callback.status, callback.error = "rejected", "Booking not found"
+        except PaymentRejected as e:
+            callback.status, callback.error = "rejected", str(e)
+        callback.applied_at = now
+        outcomes[callback.status] += 1
+    db.commit()
+    return outcomes
+
+
+def mark_failed(db: Session, callback_id: int, error: str):
+    db.execute(
+        update(Callback)
+        .where(Callback.id == callback_id, Callback.status == "received")
+        .values(status="failed", error=error[:500], applied_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+class PaymentIngest:
+    """Bounded callback queue, its worker thread and backpressure counters"""
+
+    def __init__(self, maxsize: int = QUEUE_SIZE, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._last_batch_size = 0
+        self._last_batch_ms = 0.0
+        self._last_rescan = 0.0
+
+    def _count(self, **increments):
+        with self._lock:
+            self._counts.update(increments)
+
+    # ✅ INGESTION (request thread)
+    def submit(self, db: Session, booking_id: int, amount: int, phone: str = None, key: str = None):
+        """Store a callback and queue it; returns (callback, duplicate). Raises IngestBusy when full."""
+        if key:
+            existing = db.query(Callback).filter(Callback.callback_key == key).first()
+            if existing is not None:
+                self._count(duplicates=1)
+                return existing, True
+        if self._queue.full():
+            self._count(refused=1)
+            raise IngestBusy()
+
+        callback = Callback(callback_key=key, booking_id=booking_id, amount=amount, phone=phone)
+        db.add(callback)
+        try:
+            db.commit()
+        except IntegrityError:
+            # The same key was stored by a concurrent retry
+            db.rollback()
+            self._count(duplicates=1)
+            return db.query(Callback).filter(Callback.callback_key == key).first(), True
+        db.refresh(callback)
+        self._count(received=1)
+        try:
+            self._queue.put_nowait(callback.id)
+        except queue.Full:
+            # Already durable; the next rescan applies it
+            self._count(deferred=1)
+        return callback, False
+
+    # ✅ WORKER
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="payment-ingest", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        self.rescan(stale_after=0)  # Callbacks left over from before the restart
+        while not self._stop.is_set():
+            try:
+                ids = [self._queue.get(timeout=1)]
+            except queue.Empty:
+                ids = []
+            while ids and len(ids) < self.batch_size:
+                try:
+                    ids.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if ids:
+                self.apply_batch(ids)
+            if time.monotonic() - self._last_rescan >= RESCAN_INTERVAL:
+                self.rescan()
+
+    def rescan(self, stale_after: float = RESCAN_INTERVAL) -> int:
+        """Apply received callbacks older than stale_after seconds that no queue holds; returns how many"""
+        self._last_rescan = time.monotonic()
+        total = 0
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+            after = 0
+            while not self._stop.is_set():
+                ids = [
+                    callback_id for callback_id, in db.query(Callback.id).filter(
+                        Callback.status == "received",
+                        Callback.received_at <= cutoff,
+                        Callback.id > after
+                    ).order_by(Callback.id).limit(self.batch_size)
+                ]
+                if not ids:
+                    break
+                db.close()
+                total += self.apply_batch(ids)
+                after = ids[-1]
+        except Exception as e:
+            db.rollback()
+            print(f"Error rescanning payment callbacks: {e}")
+        finally:
+            db.close()
+        return total
+
+    def apply_batch(self, callback_ids) -> int:
+        """Apply callbacks in one transaction, falling back to one by one if the batch fails"""
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            try:
+                outcomes = apply_callbacks(db, callback_ids)
+            except Exception as e:
+                db.rollback()
+                print(f"Error applying payment batch of {len(callback_ids)}, retrying singly: {e}")
+                outcomes = Counter()
+                for callback_id in callback_ids:
+                    try:
+                        outcomes += apply_callbacks(db, [callback_id])
+                    except Exception as e:
+                        db.rollback()
+                        print(f"Error applying payment callback {callback_id}: {e}")
+                        mark_failed(db, callback_id, str(e))
+                        outcomes["failed"] += 1
+        finally:
+            db.close()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._counts.update(outcomes)
+            self._counts["batches"] += 1
+            self._last_batch_size = len(callback_ids)
+            self._last_batch_ms = elapsed_ms
+        return sum(outcomes.values())
+
+    # ✅ METRICS
+    def metrics(self, db: Session) -> dict:
+        backlog, oldest = db.query(func.count(Callback.id), func.min(Callback.received_at)).filter(
+            Callback.status == "received"
+        ).one()
+        depth = self._queue.qsize()
+        with self._lock:
+            counts = dict(self._counts)
+            last_batch_size, last_batch_ms = self._last_batch_size, self._last_batch_ms
+        return {
+            "queue_depth": depth,
+            "queue_capacity": self._queue.maxsize,
+            "queue_utilization": round(depth / self._queue.maxsize, 3) if self._queue.maxsize else 0,
+            "worker_running": self._thread is not None and self._thread.is_alive(),
+            "outbox_backlog": backlog,
+            "oldest_pending_seconds": round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else 0,
+            "received": counts.get("received", 0),
+            "duplicates": counts.get("duplicates", 0),
+            "refused_queue_full": counts.get("refused", 0),
+            "deferred_to_rescan": counts.get("deferred", 0),
+            "applied": counts.get("applied", 0),
+            "rejected": counts.get("rejected", 0),
+            "failed": counts.get("failed", 0),
+            "batches": counts.get("batches", 0),
+            "last_batch_size": last_batch_size,
+            "last_batch_ms": round(last_batch_ms, 2),
+        }
+
+
+payment_ingest = PaymentIngest()
@@ -1,12 +1,96 @@
+"""
+Payment Service - The one path that records a payment against a booking
+
+The booking row is locked first (SELECT ... FOR UPDATE on PostgreSQL,
+BEGIN IMMEDIATE on SQLite, which has no row locks), then the payment is
+checked against what is still owed, inserted, and the booking confirmed
+in the same commit. Concurrent retries for one booking queue on its row
+and see each other's payments, so a booking can never be paid twice or
+beyond its amount; payments for other bookings are not held up on
+PostgreSQL.
+
+A payment must settle everything still owed. Partial payments are refused:
+a booking left pending with part of its price paid would keep its hold and
+be expired by the sweeper with the money already taken.
+"""
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from .. import models
+from .booking_lifecycle import PAID_STATUSES, BookingNotFound
+
+PAYABLE_STATUSES = ("pending",)
+
+
+class PaymentRejected(Exception):
+    pass
+
+
+def begin_write(db: Session):
+    """On SQLite, take the database write lock now rather than at the first write"""
+    if db.get_bind().dialect.name != "sqlite":
+        return
+    driver_connection = db.connection().connection.dbapi_connection
+    if not driver_connection.in_transaction:
+        driver_connection.execute("BEGIN IMMEDIATE")
+
 
-def create_payment(db: Session, data):
-    payment = models.Payment(**data.dict())
-    booking = db.query(models.Booking).get(data.booking_id)
-    if booking:
-        booking.status = "paid"
+def lock_booking(db: Session, booking_id: int):
+    """Load a booking and hold its row lock until the transaction ends"""
+    query = db.query(models.Booking).filter(models.Booking.id == booking_id)
+    if db.get_bind().dialect.name != "sqlite":
+        return query.with_for_update().first()
+    begin_write(db)
+    return query.first()
+
+
+def apply_payment(db: Session, booking_id: int, amount: int, phone: str = None) -> models.Payment:
+    """
+    Record a payment of the full amount due and confirm the booking,
+    without committing, so several payments can share one transaction.
+    Raises BookingNotFound or PaymentRejected (already paid, no longer
+    payable, not the amount due) before writing anything.
+    """
+    booking = lock_booking(db, booking_id)
+    if booking is None:
+        raise BookingNotFound()
+    if booking.status not in PAYABLE_STATUSES:
+        if booking.status in PAID_STATUSES + ("completed",):
+            raise PaymentRejected("Booking is already paid")
+        raise PaymentRejected(f"Booking is {booking.status} and can no longer be paid")
+    if amount <= 0:
+        raise PaymentRejected("Amount must be positive")
+
+    paid = db.query(func.coalesce(func.sum(models.Payment.amount), 0)).filter(
+        models.Payment.booking_id == booking_id
+    ).scalar()
+    # Bookings made before server-side pricing are owed whatever is paid first
+    due = booking.amount if booking.amount is not None else paid + amount
+    if paid + amount != due:
+        raise PaymentRejected(f"Payment must be the amount due ({due - paid})")
+
+    payment = models.Payment(
+        booking_id=booking_id,
+        user_id=booking.user_id,
+        phone=phone or booking.phone,
+        car_number=booking.car_number or "",
+        amount=amount
+    )
     db.add(payment)
-    db.commit()
+    if booking.amount is None:
+        booking.amount = due
+    booking.status = "confirmed"
+    booking.hold_expires_at = None
+    db.flush()  # Later payments in the same transaction must see this one
+    return payment
+
+
+def process_payment(db: Session, booking_id: int, amount: int, phone: str = None) -> models.Payment:
+    """apply_payment() in a transaction of its own; nothing is written if it raises"""
+    try:
+        payment = apply_payment(db, booking_id, amount, phone)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
     db.refresh(payment)
     return payment
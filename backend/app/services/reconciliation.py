@@ -0,0 +1,156 @@
+"""
+Reconciliation Service - Find payments and bookings that disagree
+
+Three checks, each a single set-based query over one range of booking ids:
+  - paid_without_payment: bookings confirmed, paid or completed with no payment
+  - amount_mismatch: bookings whose payments add up to more or less than
+    their amount (a pending booking paid in part is not a mismatch)
+  - duplicate_payments: bookings with more than one payment
+
+The booking id space is cut into ranges of chunk_size ids and the ranges
+are checked in parallel by a process pool. Each worker opens its own engine
+and reads plain rows, never ORM objects, so memory stays bounded by one
+chunk however many rows the tables hold. Only counts and the first
+`sample` findings per check are returned.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from sqlalchemy import and_, create_engine, func, not_, or_, select
+from sqlalchemy.pool import NullPool
+from .. import models
+from ..database import DATABASE_URL
+from .booking_lifecycle import PAID_STATUSES
+
+DEFAULT_CHUNK_SIZE = 50000
+DEFAULT_SAMPLE = 100
+MAX_WORKERS = 8
+CHECKS = ("paid_without_payment", "amount_mismatch", "duplicate_payments")
+
+bookings = models.Booking.__table__
+payments = models.Payment.__table__
+
+
+def paid_totals(lo: int, hi: int):
+    """Payment count and total per booking, for booking ids in [lo, hi]"""
+    return select(
+        payments.c.booking_id,
+        func.count().label("payments"),
+        func.sum(payments.c.amount).label("paid")
+    ).where(payments.c.booking_id.between(lo, hi)).group_by(payments.c.booking_id).subquery()
+
+
+def check_queries(lo: int, hi: int) -> dict:
+    totals = paid_totals(lo, hi)
+    in_range = bookings.c.id.between(lo, hi)
+    return {
+        "paid_without_payment": select(
+            bookings.c.id.label("booking_id"), bookings.c.status, bookings.c.amount
+        ).select_from(
+            bookings.outerjoin(totals, totals.c.booking_id == bookings.c.id)
+        ).where(
+            in_range,
+            bookings.c.status.in_(PAID_STATUSES + ("completed",)),
+            totals.c.booking_id.is_(None)
+        ).order_by(bookings.c.id),
+
+        "amount_mismatch": select(
+            bookings.c.id.label("booking_id"), bookings.c.status, bookings.c.amount,
+            totals.c.paid, totals.c.payments
+        ).select_from(
+            bookings.join(totals, totals.c.booking_id == bookings.c.id)
+        ).where(
+            in_range,
+            bookings.c.amount.isnot(None),
+            totals.c.paid != bookings.c.amount,
+            not_(and_(bookings.c.status == "pending", totals.c.paid < bookings.c.amount))
+        ).order_by(bookings.c.id),
+
+        "duplicate_payments": select(
+            totals.c.booking_id, bookings.c.status, bookings.c.amount,
+            totals.c.paid, totals.c.payments
+        ).select_from(
+            totals.outerjoin(bookings, bookings.c.id == totals.c.booking_id)
+        ).where(
+            totals.c.payments > 1,
+            # Partial payments that add up to the amount are expected
+            or_(bookings.c.amount.is_(None), totals.c.paid != bookings.c.amount)
+        ).order_by(totals.c.booking_id),
+    }
+
+
+def id_ranges(connection, chunk_size: int) -> list:
+    """Inclusive [lo, hi] booking id ranges covering every booking and every payment's booking_id"""
+    lo_b, hi_b = connection.execute(select(func.min(bookings.c.id), func.max(bookings.c.id))).one()
+    lo_p, hi_p = connection.execute(
+        select(func.min(payments.c.booking_id), func.max(payments.c.booking_id))
+    ).one()
+    lows = [v for v in (lo_b, lo_p) if v is not None]
+    highs = [v for v in (hi_b, hi_p) if v is not None]
+    if not lows:
+        return []
+    lo, hi = min(lows), max(highs)
+    return [(start, min(start + chunk_size - 1, hi)) for start in range(lo, hi + 1, chunk_size)]
+
+
+# ✅ WORKER PROCESS
+_engine = None
+
+
+def _init_worker(database_url: str):
+    global _engine
+    # A connection pool per worker; nothing is shared with the parent
+    _engine = create_engine(database_url, poolclass=NullPool)
+
+
+def reconcile_range(bounds, sample: int = DEFAULT_SAMPLE) -> dict:
+    """Run every check over one id range; returns {check: (count, first `sample` rows)}"""
+    lo, hi = bounds
+    found = {}
+    with _engine.connect() as connection:
+        for name, query in check_queries(lo, hi).items():
+            result = connection.execute(query)
+            count, rows = 0, []
+            for row in result:
+                if count < sample:
+                    rows.append(dict(row._mapping))
+                count += 1
+            found[name] = (count, rows)
+    return found
+
+
+def reconcile(chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = None,
+              sample: int = DEFAULT_SAMPLE, database_url: str = DATABASE_URL) -> dict:
+    """Reconcile payments against bookings across the whole database"""
+    started = time.perf_counter()
+    _init_worker(database_url)
+    with _engine.connect() as connection:
+        ranges = id_ranges(connection, chunk_size)
+
+    workers = max(1, min(workers or min(os.cpu_count() or 1, MAX_WORKERS), len(ranges) or 1))
+    if workers == 1:
+        results = [reconcile_range(bounds, sample) for bounds in ranges]
+    else:
+        # Spawned, not forked: the server process has threads and open connections
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(database_url,)
+        ) as pool:
+            results = list(pool.map(reconcile_range, ranges, [sample] * len(ranges)))
+
+    checks = {name: {"count": 0, "sample": []} for name in CHECKS}
+    for found in results:
+        for name, (count, rows) in found.items():
+            checks[name]["count"] += count
+            checks[name]["sample"].extend(rows[:sample - len(checks[name]["sample"])])
+
+    return {
+        "booking_id_range": [ranges[0][0], ranges[-1][1]] if ranges else None,
+        "chunks": len(ranges),
+        "workers": workers,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "checks": checks,
+    }
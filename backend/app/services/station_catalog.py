@@ -0,0 +1,154 @@
+"""
+Station Catalog Service - Process-local snapshot of the charging stations
+
+Station reads are served from an immutable snapshot that is loaded lazily
+and replaced as a whole. Every station edit must call invalidate_catalog()
+after it commits: that bumps the catalog version and drops the snapshot so
+the next read loads a fresh one. Readers keep whatever snapshot they grabbed,
+so a swap never shows them a half-built catalog, and concurrent readers
+that find no snapshot wait for one load instead of each running their own.
+
+available_slots changes with every booking, so it is not in the snapshot:
+responses that show it read it live with station_slots(), and bookings never
+invalidate the catalog. Every commit that changes available_slots calls
+slots_changed() instead, which only bumps the slots version that ETags of
+responses carrying live counts are built on.
+"""
+import threading
+from datetime import datetime, time
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import SessionLocal
+from ..utils.spatial_index import GridIndex
+from ..utils.time_utils import OpenHoursIndex
+from .table_versions import table_version, bump_table_version
+
+STATIONS_TABLE = models.ChargingStation.__tablename__
+SLOTS_VERSION = "station_slots"  # Bumped for available_slots alone
+
+
+class StationRecord(NamedTuple):
+    id: int
+    company_id: Optional[int]
+    name: str
+    address: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+    charging_type: Optional[str]
+    min_charge_time: Optional[int]
+    max_charge_time: Optional[int]
+    phone: Optional[str]
+    opening_time: Optional[time]
+    closing_time: Optional[time]
+    capacity: Optional[int]
+    created_at: Optional[datetime]
+
+
+_COLUMNS = [getattr(models.ChargingStation, field) for field in StationRecord._fields]
+
+
+class StationCatalog:
+    """All stations as of one catalog version, with spatial and opening-hours indexes"""
+
+    __slots__ = ("version", "stations", "by_id", "index", "open_hours")
+
+    def __init__(self, version: int, records):
+        self.version = version
+        self.stations = tuple(records)
+        self.by_id = MappingProxyType({s.id: s for s in self.stations})
+        self.index = GridIndex((s.id, s.latitude, s.longitude) for s in self.stations)
+        self.open_hours = OpenHoursIndex((s.id, s.opening_time, s.closing_time) for s in self.stations)
+
+
+_catalog = None
+_lock = threading.Lock()
+_load_lock = threading.Lock()  # One snapshot load at a time
+
+
+def peek_catalog() -> Optional[StationCatalog]:
+    """Return the current snapshot, or None if it has not been loaded"""
+    return _catalog
+
+
+def catalog_version() -> int:
+    """Incremented on every committed station edit"""
+    return table_version(STATIONS_TABLE)
+
+
+def get_catalog(db: Session = None) -> StationCatalog:
+    """
+    Return the current snapshot, loading it first if needed.
+    Opens its own session when called without one (e.g. as a background task).
+    """
+    global _catalog
+    catalog = _catalog
+    if catalog is not None:
+        return catalog
+
+    with _load_lock:
+        with _lock:
+            # Loaded by the caller we waited for
+            if _catalog is not None:
+                return _catalog
+            version = catalog_version()
+
+        session = db or SessionLocal()
+        try:
+            rows = session.query(*_COLUMNS).order_by(models.ChargingStation.id).all()
+        finally:
+            if db is None:
+                session.close()
+        catalog = StationCatalog(version, (StationRecord(*row) for row in rows))
+
+        with _lock:
+            # If an edit committed during the load, serve this caller but don't install it
+            if version == catalog_version() and _catalog is None:
+                _catalog = catalog
+    return catalog
+
+
+def stream_station_records(chunk_size: int = 1000):
+    """
+    Yield (StationRecord, available_slots) straight from the database in id
+    order, fetching chunk_size rows at a time. Uses its own session so it can
+    outlive the request.
+    """
+    Station = models.ChargingStation
+    db = SessionLocal()
+    try:
+        rows = db.query(*_COLUMNS, Station.available_slots).order_by(Station.id).yield_per(chunk_size)
+        for *row, slots in rows:
+            yield StationRecord(*row), slots or 0
+    finally:
+        db.close()
+
+
+def station_slots(db: Session, station_ids=None) -> dict:
+    """Live available_slots by station id, for all stations or only station_ids"""
+    Station = models.ChargingStation
+    query = db.query(Station.id, Station.available_slots)
+    if station_ids is not None:
+        if not station_ids:
+            return {}
+        query = query.filter(Station.id.in_(station_ids))
+    return {station_id: slots or 0 for station_id, slots in query}
+
+
+def slots_version() -> int:
+    """Incremented on every committed change to available_slots"""
+    return table_version(SLOTS_VERSION)
+
+
+def slots_changed():
+    """Call after committing any change to available_slots"""
+    bump_table_version(SLOTS_VERSION)
+
+
+def invalidate_catalog():
+    """Call after committing any change to charging_stations other than available_slots"""
+    global _catalog
+    with _lock:
+        _catalog = None
+        bump_table_version(STATIONS_TABLE)
@@ -0,0 +1,169 @@
+"""
+Station Import Service - Bulk loading of charging stations from CSV or NDJSON
+
+Rows are validated one at a time as they are read and buffered into batches;
+each batch is written with a single executemany INSERT and committed, so
+memory stays flat and a bad row never aborts the whole import.
+CSV input must have a header row and one record per line.
+"""
+import codecs
+import csv
+import json
+from datetime import time
+from typing import Optional
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from .. import models
+from .station_catalog import invalidate_catalog
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+class StationImportRow(BaseModel):
+    name: str
+    address: str
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    company_id: Optional[int] = None
+    charging_type: str = "AC"
+    phone: str
+    min_charge_time: Optional[int] = None
+    max_charge_time: Optional[int] = None
+    available_slots: int = Field(5, ge=0)
+    capacity: Optional[int] = Field(None, ge=0)
+    opening_time: time
+    closing_time: time
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+
+class StationImporter:
+    """
+    Feed raw rows with add(); call flush() whenever add() returns True
+    and once more at the end, then read summary().
+    """
+
+    def __init__(self, db: Session, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.batch = []  # (line_no, values)
+        self.inserted = 0
+        self.batches = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line_no: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def add(self, line_no: int, raw: dict) -> bool:
+        """Validate one row and buffer it; returns True when a batch is ready"""
+        # Empty CSV cells mean "not set"
+        raw = {k: v for k, v in raw.items() if k and v not in ("", None)}
+        try:
+            row = StationImportRow(**raw)
+        except ValidationError as e:
+            self.error(line_no, _describe(e))
+            return False
+        values = row.model_dump()
+        if values["capacity"] is None:
+            values["capacity"] = values["available_slots"]
+        self.batch.append((line_no, values))
+        return len(self.batch) >= self.batch_size
+
+    def flush(self):
+        """Write the buffered batch in one INSERT and commit it"""
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        try:
+            self.db.execute(insert(models.ChargingStation), [values for _, values in batch])
+            self.db.commit()
+            self.inserted += len(batch)
+        except Exception:
+            # Retry row by row so the error points at the offending lines
+            self.db.rollback()
+            for line_no, values in batch:
+                try:
+                    self.db.execute(insert(models.ChargingStation), [values])
+                    self.db.commit()
+                    self.inserted += 1
+                except Exception as e:
+                    self.db.rollback()
+                    self.error(line_no, str(getattr(e, "orig", e)))
+        self.batches += 1
+
+    def finish(self):
+        """Flush the last batch and publish the new stations"""
+        try:
+            self.flush()
+        finally:
+            if self.inserted:
+                invalidate_catalog()
+
+    def summary(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "batches": self.batches,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def parse_line(fmt: str, line: str, header):
+    """
+    Parse one input line. Returns (row, header); row is None for blank lines
+    and for the CSV header itself. Raises ValueError for malformed lines.
+    """
+    if not line.strip():
+        return None, header
+    if fmt == "ndjson":
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError("expected a JSON object")
+        return row, header
+    values = next(csv.reader([line]))
+    if header is None:
+        return None, [h.strip() for h in values]
+    if len(values) != len(header):
+        raise ValueError(f"expected {len(header)} columns, got {len(values)}")
+    return dict(zip(header, values)), header
+
+
+def import_lines(db: Session, lines, fmt: str = "csv", batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Import stations from an iterable of text lines (e.g. an open file)"""
+    importer = StationImporter(db, batch_size)
+    header = None
+    try:
+        for line_no, line in enumerate(lines, start=1):
+            try:
+                row, header = parse_line(fmt, line, header)
+            except ValueError as e:
+                importer.error(line_no, str(e))
+                continue
+            if row is not None and importer.add(line_no, row):
+                importer.flush()
+    finally:
+        importer.finish()
+    return importer.summary()
+
+
+async def iter_lines(chunks):
+    """Split an async stream of byte chunks (e.g. request.stream()) into text lines"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
@@ -0,0 +1,82 @@
+"""
+Station Search Service - Radius and k-nearest queries over charging stations
+
+Queries run against the in-memory station catalog when it is loaded. While
+it is missing, they fall back to a bounding-box query that runs in SQL
+against ix_charging_stations_lat_lon.
+"""
+import heapq
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from .. import models
+from ..utils.geo import bounding_box, distances_km
+from .station_catalog import peek_catalog
+
+
+def _bbox_filter(lat, lon, radius_km):
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    latitude = models.ChargingStation.latitude
+    longitude = models.ChargingStation.longitude
+
+    lat_filter = latitude.between(min_lat, max_lat)
+    if min_lon < -180:
+        lon_filter = or_(longitude >= min_lon + 360, longitude <= max_lon)
+    elif max_lon > 180:
+        lon_filter = or_(longitude >= min_lon, longitude <= max_lon - 360)
+    else:
+        lon_filter = longitude.between(min_lon, max_lon)
+    return and_(lat_filter, lon_filter)
+
+
+def _candidates(db: Session, catalog, lat: float, lon: float, radius_km: float):
+    """(station_id, distance_km) pairs within radius_km, without loading rows"""
+    if catalog is not None:
+        return catalog.index.within(lat, lon, radius_km)
+
+    # Only ids and coordinates inside the box leave the database
+    rows = [
+        r for r in db.query(
+            models.ChargingStation.id,
+            models.ChargingStation.latitude,
+            models.ChargingStation.longitude
+        ).filter(_bbox_filter(lat, lon, radius_km)).all()
+        if r.latitude and r.longitude
+    ]
+    if not rows:
+        return []
+    dists = distances_km(lat, lon, [r.latitude for r in rows], [r.longitude for r in rows])
+    return [(r.id, d) for r, d in zip(rows, dists.tolist()) if d <= radius_km]
+
+
+def nearest_stations(db: Session, lat: float, lon: float, radius_km: float, k: int, after=None, only_ids=None):
+    """
+    Returns up to k (station, distance_km) pairs within radius_km, closest first,
+    plus a flag telling whether more stations remain.
+    `after` is the (distance_km, station_id) of the last station already returned.
+    `only_ids`, if given, restricts the search to those station ids.
+    Stations are catalog records when the catalog is loaded, ORM rows otherwise.
+    """
+    catalog = peek_catalog()
+
+    # Rounded to the millimetre so page boundaries are stable between calls
+    candidates = ((round(d, 6), station_id) for station_id, d in _candidates(db, catalog, lat, lon, radius_km))
+    if after is not None:
+        candidates = (c for c in candidates if c > after)
+    if only_ids is not None:
+        candidates = (c for c in candidates if c[1] in only_ids)
+
+    top = heapq.nsmallest(k + 1, candidates)
+    has_more = len(top) > k
+    top = top[:k]
+    if not top:
+        return [], False
+
+    if catalog is not None:
+        stations = catalog.by_id
+    else:
+        stations = {
+            s.id: s for s in db.query(models.ChargingStation).filter(
+                models.ChargingStation.id.in_([station_id for _, station_id in top])
+            )
+        }
+    return [(stations[station_id], d) for d, station_id in top if station_id in stations], has_more
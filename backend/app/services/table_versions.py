@@ -0,0 +1,23 @@
+"""
+Table Versions - Process-local change counters used to validate cached reads
+
+Any code path that commits a change to a table listed here must call
+bump_table_version() afterwards, so caches and ETags built on the old
+version stop matching.
+"""
+import threading
+
+_versions = {}
+_lock = threading.Lock()
+
+
+def table_version(table: str) -> int:
+    """Current change counter for a table (0 until the first write)"""
+    return _versions.get(table, 0)
+
+
+def bump_table_version(table: str) -> int:
+    """Record a committed write to a table and return its new version"""
+    with _lock:
+        _versions[table] = _versions.get(table, 0) + 1
+        return _versions[table]
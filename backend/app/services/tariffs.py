@@ -0,0 +1,163 @@
+"""
+Tariff Service - Server-side booking prices
+
+The tariffs table is compiled into hourly rate arrays, one per pricing
+profile: the network default, each charging type with tariffs of its own
+and each station with tariffs of its own. Every profile holds a rate per
+(duration tier, hour of day), stored as running sums over two days so the
+price of any window is two lookups. Quoting many stations is then one
+fancy-indexing call over the profile of each station.
+
+Like the station catalog, the compiled table is process-local and rebuilt
+when the tariffs table version changes; every tariff write must call
+bump_table_version(TARIFFS_TABLE) after it commits.
+"""
+import os
+import threading
+from datetime import datetime
+from typing import NamedTuple, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import SessionLocal
+from .table_versions import table_version
+
+HOURS_PER_DAY = 24
+DEFAULT_RATE_PER_HOUR = int(os.getenv("DEFAULT_RATE_PER_HOUR", "60"))  # ₹, the rate the app has always shown
+TARIFFS_TABLE = models.Tariff.__tablename__
+
+
+class TariffRule(NamedTuple):
+    id: int
+    station_id: Optional[int]
+    charging_type: Optional[str]
+    start_hour: int
+    end_hour: int
+    min_hours: int
+    rate_per_hour: int
+
+
+_COLUMNS = [getattr(models.Tariff, field) for field in TariffRule._fields]
+
+
+def band_hours(start_hour: int, end_hour: int) -> list:
+    """Hours of day in [start_hour, end_hour), wrapping past midnight when end <= start"""
+    if end_hour <= start_hour:
+        end_hour += HOURS_PER_DAY
+    return [hour % HOURS_PER_DAY for hour in range(start_hour, end_hour)]
+
+
+def profile_rates(rules, station_id: Optional[int], charging_type: Optional[str]) -> np.ndarray:
+    """Rate per (duration tier, hour of day); tier d - 1 holds bookings of d hours (24 and up share the last)"""
+    rates = np.full((HOURS_PER_DAY, HOURS_PER_DAY), DEFAULT_RATE_PER_HOUR, dtype=np.int64)
+    matching = [
+        r for r in rules
+        if r.station_id in (None, station_id) and r.charging_type in (None, charging_type)
+    ]
+    # Later rules overwrite earlier ones, so apply the most specific last
+    matching.sort(key=lambda r: (r.station_id is not None, r.charging_type is not None, r.min_hours, r.id))
+    for r in matching:
+        first_tier = min(max(r.min_hours, 1), HOURS_PER_DAY) - 1
+        rates[first_tier:, band_hours(r.start_hour, r.end_hour)] = r.rate_per_hour
+    return rates
+
+
+class TariffTable:
+    """All tariffs as of one version, compiled for vectorized quotes"""
+
+    __slots__ = ("version", "cumulative", "type_profiles", "station_profiles")
+
+    def __init__(self, version: int, rules, station_types: dict):
+        """station_types maps the id of every station with its own tariffs to its charging type"""
+        self.version = version
+        rules = list(rules)
+        keys = [(None, None)]
+        keys += [(None, t) for t in sorted({r.charging_type for r in rules if r.charging_type is not None})]
+        keys += [(s, station_types.get(s)) for s in sorted({r.station_id for r in rules if r.station_id is not None})]
+
+        self.type_profiles = {t: i for i, (s, t) in enumerate(keys) if s is None and t is not None}
+        self.station_profiles = {s: i for i, (s, t) in enumerate(keys) if s is not None}
+
+        rates = np.stack([profile_rates(rules, s, t) for s, t in keys])
+        two_days = np.concatenate([rates, rates], axis=2)
+        self.cumulative = np.zeros(two_days.shape[:2] + (2 * HOURS_PER_DAY + 1,), dtype=np.int64)
+        np.cumsum(two_days, axis=2, out=self.cumulative[:, :, 1:])
+
+    def profile(self, station_id: int, charging_type: Optional[str]) -> int:
+        profile = self.station_profiles.get(station_id)
+        if profile is None:
+            profile = self.type_profiles.get(charging_type, 0)
+        return profile
+
+    def quote(self, stations, start_hour, hours) -> np.ndarray:
+        """
+        Prices for booking each of `stations` (anything with id and
+        charging_type) from start_hour for `hours` hours. start_hour and hours
+        may be single values or arrays matching the stations.
+        """
+        profiles = np.fromiter((self.profile(s.id, s.charging_type) for s in stations), dtype=np.int64)
+        start = np.broadcast_to(np.asarray(start_hour, dtype=np.int64) % HOURS_PER_DAY, profiles.shape)
+        hours = np.broadcast_to(np.maximum(np.asarray(hours, dtype=np.int64), 1), profiles.shape)
+
+        tier = np.minimum(hours, HOURS_PER_DAY) - 1
+        days, rest = np.divmod(hours, HOURS_PER_DAY)
+        cumulative = self.cumulative[profiles, tier]  # (stations, 49)
+        rows = np.arange(len(profiles))
+        full_day = cumulative[rows, start + HOURS_PER_DAY] - cumulative[rows, start]
+        return days * full_day + cumulative[rows, start + rest] - cumulative[rows, start]
+
+    def quote_one(self, station_id: int, charging_type: Optional[str], start_hour: int, hours: int) -> int:
+        station = _Station(station_id, charging_type)
+        return int(self.quote([station], start_hour, hours)[0])
+
+
+class _Station(NamedTuple):
+    id: int
+    charging_type: Optional[str]
+
+
+_table = None
+_lock = threading.Lock()
+
+
+def get_tariffs(db: Session = None) -> TariffTable:
+    """Return the compiled tariffs, rebuilding them if the table changed"""
+    global _table
+    version = table_version(TARIFFS_TABLE)
+    table = _table
+    if table is not None and table.version == version:
+        return table
+
+    session = db or SessionLocal()
+    try:
+        rules = [TariffRule(*row) for row in session.query(*_COLUMNS).all()]
+        station_ids = {r.station_id for r in rules if r.station_id is not None}
+        station_types = dict(
+            session.query(models.ChargingStation.id, models.ChargingStation.charging_type)
+            .filter(models.ChargingStation.id.in_(station_ids)).all()
+        ) if station_ids else {}
+    finally:
+        if db is None:
+            session.close()
+
+    table = TariffTable(version, rules, station_types)
+    with _lock:
+        if table_version(TARIFFS_TABLE) == version:
+            _table = table
+    return table
+
+
+def start_hour(day=None, start_time=None, now: datetime = None) -> int:
+    """Hour a booking starts: its booked start time, or now for immediate bookings"""
+    if day is not None and start_time is not None:
+        return start_time.hour
+    return (now or datetime.now()).hour
+
+
+def price_booking(db: Session, data) -> int:
+    """Price of a BookingCreate (or a waitlist entry, which always starts now)"""
+    charging_type = db.query(models.ChargingStation.charging_type).filter(
+        models.ChargingStation.id == data.station_id
+    ).scalar()
+    hour = start_hour(getattr(data, "date", None), getattr(data, "booking_start_time", None))
+    return get_tariffs(db).quote_one(data.station_id, charging_type, hour, data.hours)
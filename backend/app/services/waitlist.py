@@ -0,0 +1,183 @@
+"""
+Waitlist Service - Queue booking requests for stations with no free slot
+
+Entries are stored in waitlist_entries and mirrored in a per-station heap
+ordered by (priority desc, id), so the head of a queue is found without a
+query. Whenever slots are given back (cancellation, completion, expired
+holds) the heads of the affected queues are promoted into pending bookings
+and notified.
+
+Promotion claims an entry with a conditional UPDATE on its status and takes
+the slot with reserve_slot() in the same transaction, so an entry is never
+promoted twice and a slot is never handed out twice, even across workers.
+The heaps are per process: a queue found empty is re-read from the database
+before giving up, which picks up entries enqueued by other workers.
+"""
+import asyncio
+import heapq
+import threading
+from datetime import datetime
+from sqlalchemy import and_, func, insert, or_, update
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import SessionLocal
+from .booking_holds import hold_expiry, hold_sweeper
+from .booking_lifecycle import booking_end, on_slots_released
+from .booking_service import reserve_slot
+from .station_catalog import slots_changed
+from .tariffs import price_booking
+
+Entry = models.WaitlistEntry
+
+BOOKING_COLUMNS = ("station_id", "user_id", "company_id", "name", "phone", "car_number", "hours")
+
+
+def _heap_key(entry_id: int, priority: int):
+    return (-(priority or 0), entry_id)
+
+
+class Waitlist:
+    """Per-station queues of waiting entry ids"""
+
+    def __init__(self):
+        self._queues = {}  # station_id -> heap of (-priority, entry_id)
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, station_id: int) -> list:
+        rows = db.query(Entry.id, Entry.priority).filter(
+            Entry.station_id == station_id,
+            Entry.status == "waiting"
+        ).all()
+        queue = [_heap_key(entry_id, priority) for entry_id, priority in rows]
+        heapq.heapify(queue)
+        with self._lock:
+            self._queues[station_id] = queue
+        return queue
+
+    def _queue(self, db: Session, station_id: int) -> list:
+        with self._lock:
+            queue = self._queues.get(station_id)
+        if not queue:
+            queue = self._load(db, station_id)
+        return queue
+
+    def enqueue(self, db: Session, data, priority: int = 0, email: str = None) -> models.WaitlistEntry:
+        entry = Entry(
+            **{column: getattr(data, column, None) for column in BOOKING_COLUMNS},
+            priority=priority,
+            email=email
+        )
+        db.add(entry)
+        db.commit()
+        db.refresh(entry)
+        queue = self._queue(db, entry.station_id)
+        with self._lock:
+            if _heap_key(entry.id, entry.priority) not in queue:
+                heapq.heappush(queue, _heap_key(entry.id, entry.priority))
+        # The slot that was missing may have been released meanwhile
+        self.promote(db, entry.station_id)
+        return entry
+
+    def position(self, db: Session, entry: models.WaitlistEntry) -> int:
+        """
+        1-based place in the station's queue. Counted from the database, not
+        the heap, which still holds cancelled entries and misses other workers'.
+        """
+        priority = entry.priority or 0
+        ahead = db.query(func.count(Entry.id)).filter(
+            Entry.station_id == entry.station_id,
+            Entry.status == "waiting",
+            or_(Entry.priority > priority, and_(Entry.priority == priority, Entry.id < entry.id))
+        ).scalar()
+        return ahead + 1
+
+    def cancel(self, db: Session, entry_id: int) -> bool:
+        """Leave the queue; the heap entry is dropped when it reaches the head"""
+        cancelled = db.execute(
+            update(Entry).where(Entry.id == entry_id, Entry.status == "waiting").values(status="cancelled")
+        ).rowcount == 1
+        db.commit()
+        return cancelled
+
+    def promote(self, db: Session, station_id: int) -> int:
+        """Turn queue heads into bookings while the station has free slots; returns how many"""
+        promoted = 0
+        queue = self._queue(db, station_id)
+        while True:
+            with self._lock:
+                if not queue:
+                    return promoted
+                entry_id = queue[0][1]
+            outcome = promote_entry(db, entry_id, station_id)
+            if outcome == "no_slot":
+                return promoted
+            with self._lock:
+                if queue and queue[0][1] == entry_id:
+                    heapq.heappop(queue)
+            if outcome == "promoted":
+                promoted += 1
+
+    def promote_stations(self, station_ids):
+        db = SessionLocal()
+        try:
+            for station_id in station_ids:
+                self.promote(db, station_id)
+        finally:
+            db.close()
+
+
+def promote_entry(db: Session, entry_id: int, station_id: int) -> str:
+    """
+    Book a waiting entry into a free slot.
+    Returns 'promoted', 'no_slot' (left waiting) or 'gone' (cancelled or already promoted).
+    """
+    claimed = db.execute(
+        update(Entry).where(Entry.id == entry_id, Entry.status == "waiting").values(status="promoted")
+    ).rowcount == 1
+    if not claimed:
+        db.rollback()
+        return "gone"
+    entry = db.get(Entry, entry_id)
+    now = datetime.now()
+    if not reserve_slot(db, station_id, entry.hours, now):
+        db.rollback()
+        return "no_slot"
+
+    values = {column: getattr(entry, column) for column in BOOKING_COLUMNS}
+    expires_at = hold_expiry()
+    booking_id = db.execute(
+        insert(models.Booking).values(
+            **values,
+            amount=price_booking(db, entry),
+            date=now.date(),
+            hold_expires_at=expires_at,
+            ends_at=booking_end(None, None, entry.hours, now)
+        ).returning(models.Booking.id)
+    ).scalar_one()
+    entry.booking_id = booking_id
+    db.commit()
+    slots_changed()
+    hold_sweeper.schedule(booking_id, expires_at)
+    notify_promoted(entry, booking_id, expires_at)
+    return "promoted"
+
+
+def notify_promoted(entry: models.WaitlistEntry, booking_id: int, pay_by: datetime):
+    print(f"[WAITLIST] Entry {entry.id} promoted to booking {booking_id} at station {entry.station_id}")
+    if entry.email:
+        # Off the releasing thread, which may be serving a request
+        args = (entry.email, entry.station_id, booking_id, pay_by)
+        threading.Thread(target=_send_email, args=args, daemon=True).start()
+
+
+def _send_email(email: str, station_id: int, booking_id: int, pay_by: datetime):
+    try:
+        # Imported here: the mail settings are only required once a mail is sent
+        from ..email_service import send_waitlist_email
+        asyncio.run(send_waitlist_email(email, station_id, booking_id, pay_by))
+    except Exception as e:
+        print(f"[EMAIL ERROR] {str(e)}")
+
+
+waitlist = Waitlist()
+on_slots_released(waitlist.promote_stations)
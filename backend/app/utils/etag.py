@@ -0,0 +1,33 @@
+import hashlib
+import secrets
+from fastapi import Request, Response
+
+# Versions are per process, so tags from different workers must never collide
+BOOT_ID = secrets.token_hex(4)
+
+
+def make_etag(name: str, version: int, variant: str = "") -> str:
+    """
+    Strong ETag for a resource at a given table version.
+    `variant` distinguishes responses of the same resource (e.g. query strings).
+    """
+    tag = f"{name}-{BOOT_ID}-{version}"
+    if variant:
+        tag += "-" + hashlib.sha1(variant.encode()).hexdigest()[:12]
+    return f'"{tag}"'
+
+
+def not_modified(request: Request, response: Response, etag: str):
+    """
+    Returns a 304 response if the request's If-None-Match already names
+    this ETag; otherwise sets the ETag header on the outgoing response.
+    """
+    header = request.headers.get("if-none-match")
+    if header:
+        # If-None-Match uses weak comparison, so ignore any W/ prefix
+        candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=304, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    return None
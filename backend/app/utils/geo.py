@@ -1,8 +1,59 @@
 from math import radians, cos, sin, sqrt, atan2
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEG_LAT = 111.32
+
 
 def distance_km(lat1, lon1, lat2, lon2):
-    R = 6371
+    R = EARTH_RADIUS_KM
     dlat = radians(lat2 - lat1)
     dlon = radians(lon2 - lon1)
     a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
     return R * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Lat/lon box that contains every point within radius_km of (lat, lon).
+    Returns (min_lat, max_lat, min_lon, max_lon). Longitudes are not wrapped,
+    so min_lon < -180 or max_lon > 180 means the box crosses the antimeridian.
+    """
+    dlat = radius_km / KM_PER_DEG_LAT
+    lat_cos = cos(radians(min(abs(lat) + dlat, 90)))
+    if lat_cos < 1e-6 or radius_km / (KM_PER_DEG_LAT * lat_cos) >= 180:
+        return max(lat - dlat, -90), min(lat + dlat, 90), -180, 180
+    dlon = radius_km / (KM_PER_DEG_LAT * lat_cos)
+    return max(lat - dlat, -90), min(lat + dlat, 90), lon - dlon, lon + dlon
+
+
+def _as_float_array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    # Inputs are already in radians and broadcast-compatible
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def distances_km(lat, lon, lats, lons):
+    """
+    Distance in km from one point to every point in lats/lons.
+    Returns a float64 array with the same length as lats.
+    """
+    lats = np.radians(_as_float_array(lats))
+    lons = np.radians(_as_float_array(lons))
+    return _haversine(radians(lat), radians(lon), lats, lons)
+
+
+def distance_matrix_km(lats1, lons1, lats2, lons2):
+    """
+    Pairwise distances in km: result[i, j] is the distance from
+    point i of the first set to point j of the second set.
+    """
+    lats1 = np.radians(_as_float_array(lats1))[:, np.newaxis]
+    lons1 = np.radians(_as_float_array(lons1))[:, np.newaxis]
+    lats2 = np.radians(_as_float_array(lats2))[np.newaxis, :]
+    lons2 = np.radians(_as_float_array(lons2))[np.newaxis, :]
+    return _haversine(lats1, lons1, lats2, lons2)
@@ -0,0 +1,47 @@
+from typing import Optional
+from fastapi import HTTPException, Response
+from sqlalchemy.orm import Session
+from ..services.idempotency import (
+    claim, complete, release, request_hash, IdempotencyConflict, IdempotencyInProgress
+)
+from .serialization import dumps
+
+MAX_KEY_LENGTH = 255
+
+
+def idempotent(db: Session, scope: str, key: Optional[str], payload: dict, execute, status_code: int = 200):
+    """
+    Run `execute` (which returns a JSON-ready body) at most once per
+    Idempotency-Key and scope. Retries with the same key and payload get the
+    first response back with an Idempotent-Replayed header; a failed request
+    (any exception) releases the key. Without a key, `execute` just runs.
+    """
+    if not key:
+        return Response(dumps(execute()), status_code=status_code, media_type="application/json")
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters")
+
+    full_key = f"{scope}:{key}"
+    digest = request_hash(payload)
+    try:
+        stored = claim(db, full_key, digest)
+    except IdempotencyConflict:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    except IdempotencyInProgress:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+    if stored is not None:
+        return Response(
+            stored.body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    try:
+        body = dumps(execute())
+    except BaseException:
+        release(db, full_key)
+        raise
+    complete(db, full_key, digest, status_code, body.decode())
+    return Response(body, status_code=status_code, media_type="application/json")
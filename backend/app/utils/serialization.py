@@ -0,0 +1,51 @@
+import json
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up; fall back to the standard encoder
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson when it is installed.
+    Endpoints opt in with response_class=FastJSONResponse and return plain
+    dicts built by project(), which skips building and validating a pydantic
+    model per row; the route's response_model still documents the shape.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def dumps(content) -> bytes:
+    """Encode one JSON document the same way FastJSONResponse does"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+
+
+def ndjson_chunk(rows) -> bytes:
+    """One NDJSON line per row"""
+    return b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def response_fields(model) -> tuple:
+    """Field names of a response model, computed once at import time"""
+    return tuple(model.model_fields)
+
+
+def project(obj, fields: tuple, **overrides) -> dict:
+    """Copy `fields` from a row / record into a dict ready for FastJSONResponse"""
+    data = {field: getattr(obj, field, None) for field in fields}
+    data.update(overrides)
+    return data
+
+
+def response_headers(response) -> dict:
+    """Headers set on an endpoint's injected Response, minus the body-specific ones"""
+    if response is None:
+        return {}
+    return {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
@@ -0,0 +1,77 @@
+from math import floor
+import numpy as np
+from .geo import bounding_box, distances_km
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid over a set of points.
+    A radius query only visits the cells that overlap the search circle,
+    so its cost depends on local density, not on the total number of points.
+
+    Points are stored sorted by cell in contiguous arrays, and each cell
+    maps to a slice of them, so distances are computed in one vectorized call.
+    """
+
+    def __init__(self, points, cell_deg=0.1):
+        self.cell_deg = cell_deg
+        self.n_cols = int(round(360 / cell_deg))
+
+        points = [(self._cell(lat, lon), point_id, lat, lon) for point_id, lat, lon in points if lat and lon]
+        points.sort(key=lambda p: p[0])
+
+        self.ids = np.array([p[1] for p in points], dtype=np.int64)
+        self.lats = np.array([p[2] for p in points], dtype=np.float64)
+        self.lons = np.array([p[3] for p in points], dtype=np.float64)
+        self.size = len(points)
+
+        self.cells = {}
+        for pos, (key, _, _, _) in enumerate(points):
+            start, _ = self.cells.get(key, (pos, pos))
+            self.cells[key] = (start, pos + 1)
+
+    def _row(self, lat):
+        return floor((lat + 90) / self.cell_deg)
+
+    def _col(self, lon):
+        return floor((lon + 180) / self.cell_deg) % self.n_cols
+
+    def _cell(self, lat, lon):
+        return (self._row(lat), self._col(lon))
+
+    def _cells_around(self, lat, lon, radius_km):
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+
+        rows = range(self._row(min_lat), self._row(max_lat) + 1)
+        first_col = floor((min_lon + 180) / self.cell_deg)
+        last_col = floor((max_lon + 180) / self.cell_deg)
+        if last_col - first_col + 1 >= self.n_cols:
+            cols = range(self.n_cols)
+        else:
+            # Wrap around the antimeridian
+            cols = {c % self.n_cols for c in range(first_col, last_col + 1)}
+
+        if len(rows) * len(cols) > len(self.cells):
+            # Window is larger than the occupied grid; walk the occupied cells instead
+            cols = set(cols)
+            for key in self.cells:
+                if key[0] in rows and key[1] in cols:
+                    yield key
+            return
+
+        for row in rows:
+            for col in cols:
+                yield (row, col)
+
+    def within(self, lat, lon, radius_km):
+        """
+        Returns a list of (point_id, distance_km) for points within radius_km.
+        """
+        slices = [self.cells[key] for key in self._cells_around(lat, lon, radius_km) if key in self.cells]
+        if not slices:
+            return []
+
+        positions = np.concatenate([np.arange(start, end) for start, end in slices])
+        dists = distances_km(lat, lon, self.lats[positions], self.lons[positions])
+        mask = dists <= radius_km
+        return list(zip(self.ids[positions][mask].tolist(), dists[mask].tolist()))
@@ -1,10 +1,114 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+import numpy as np
 
-def is_station_open(opening_time, closing_time):
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def is_station_open(opening_time, closing_time, now=None):
     """
-    Returns True if current time is between opening and closing time.
+    Returns True if the time of `now` (default: current time) is between
+    opening and closing time. Hours may run past midnight (e.g. 22:00-06:00);
+    equal opening and closing times mean open around the clock.
     """
     if not opening_time or not closing_time:
         return False
-    now = datetime.now().time()
-    return opening_time <= now <= closing_time
+    now = (now or datetime.now()).time()
+    if opening_time == closing_time:
+        return True
+    if opening_time < closing_time:
+        return opening_time <= now <= closing_time
+    return now >= opening_time or now <= closing_time
+
+
+def is_open_throughout(opening_time, closing_time, start: datetime, end: datetime) -> bool:
+    """
+    Returns True if the station is open from `start` until `end`: open at
+    `start` and not closing before `end`. A booking may end at the closing time.
+    """
+    if not is_station_open(opening_time, closing_time, start):
+        return False
+    if opening_time == closing_time:
+        return True
+    closing = datetime.combine(start.date(), closing_time)
+    if closing < start.replace(second=0, microsecond=0):
+        closing += timedelta(days=1)  # Closes after midnight
+    return end <= closing
+
+
+def minute_of_week(when: datetime) -> int:
+    """Monday 00:00 is minute 0"""
+    return when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+
+def weekly_intervals(opening_time, closing_time):
+    """
+    Daily opening hours as half-open [start, end) minute-of-week intervals.
+    The closing minute itself counts as open, matching is_station_open.
+    """
+    if not opening_time or not closing_time:
+        return []
+    if opening_time == closing_time:
+        return [(0, MINUTES_PER_WEEK)]
+
+    open_min = opening_time.hour * 60 + opening_time.minute
+    close_min = closing_time.hour * 60 + closing_time.minute + 1
+    if close_min <= open_min:
+        close_min += MINUTES_PER_DAY  # Runs past midnight
+
+    intervals = []
+    for day in range(7):
+        start = day * MINUTES_PER_DAY + open_min
+        end = day * MINUTES_PER_DAY + close_min
+        if end > MINUTES_PER_WEEK:
+            # Sunday night continues into Monday morning
+            intervals.append((0, end - MINUTES_PER_WEEK))
+            end = MINUTES_PER_WEEK
+        intervals.append((start, end))
+    return intervals
+
+
+class OpenHoursIndex:
+    """
+    Opening hours of many stations normalized into minute-of-week intervals,
+    held in flat arrays so "which stations are open at T" is one vectorized
+    comparison instead of a per-station check.
+    """
+
+    def __init__(self, stations):
+        ids, starts, ends, carry = [], [], [], []
+        for station_id, opening_time, closing_time in stations:
+            intervals = weekly_intervals(opening_time, closing_time)
+            # Hours past midnight are split at the end of the week;
+            # the Sunday night part carries on into the Monday morning part
+            wraps = bool(intervals) and opening_time >= closing_time
+            monday = next((end for start, end in intervals if start == 0), 0)
+            for start, end in intervals:
+                ids.append(station_id)
+                starts.append(start)
+                ends.append(end)
+                carry.append(monday if wraps and end == MINUTES_PER_WEEK else 0)
+        self.ids = np.array(ids, dtype=np.int64)
+        self.starts = np.array(starts, dtype=np.int32)
+        self.ends = np.array(ends, dtype=np.int32)
+        self.carry = np.array(carry, dtype=np.int32)
+        self._last = (None, frozenset())
+
+    def open_at(self, when: datetime = None) -> frozenset:
+        """Ids of the stations open at `when` (default: now)"""
+        minute = minute_of_week(when or datetime.now())
+        last_minute, last_ids = self._last
+        if minute == last_minute:
+            return last_ids
+        mask = (self.starts <= minute) & (self.ends > minute)
+        ids = frozenset(self.ids[mask].tolist())
+        self._last = (minute, ids)
+        return ids
+
+    def open_throughout(self, start: datetime, end: datetime) -> frozenset:
+        """Ids of the stations open from `start` until `end`, at most a day later (see is_open_throughout)"""
+        minute = minute_of_week(start)
+        end_minute = minute + (end - start.replace(second=0, microsecond=0)).total_seconds() / 60
+        # The closing minute is the last one of the interval, or of its continuation after Sunday
+        mask = (self.starts <= minute) & (self.ends > minute) & (self.ends + self.carry - 1 >= end_minute)
+        return frozenset(self.ids[mask].tolist())
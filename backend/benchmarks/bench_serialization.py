@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Compare the default FastAPI response path with the FastJSONResponse fast path
+for list endpoints. Both routes return the same in-memory stations / companies,
+so the difference is serialization only.
+
+Usage (from backend/): python -m benchmarks.bench_serialization [--rows 5000] [--repeat 20]
+"""
+
+import argparse
+import time
+from datetime import datetime, time as dtime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers.stations import StationOut, station_json
+from app.routers.companies import COMPANY_FIELDS
+from app.schemas import CompanyOut
+from app.services.station_catalog import StationRecord
+from app.utils.serialization import FastJSONResponse, project
+
+
+class Row:
+    """Stands in for an ORM row"""
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def build_app(rows: int) -> FastAPI:
+    now = datetime.utcnow()
+    stations = [
+        StationRecord(i, None, f"Station {i}", f"Street {i}", 12.9 + i / 1e5, 77.5 + i / 1e5,
+                      "AC", 30, 120, "9876500000", dtime(6, 0), dtime(22, 0), 5, now)
+        for i in range(rows)
+    ]
+    companies = [
+        Row(id=i, name=f"Company {i}", description="EV charging", country="India", category="AC/DC Charger",
+            website=None, logo_url=None, views=i, bookings_count=0, created_at=now, updated_at=now)
+        for i in range(rows)
+    ]
+
+    app = FastAPI()
+
+    @app.get("/default/stations", response_model=list[StationOut])
+    def default_stations():
+        # What the handlers did before: one StationOut per row, then response_model
+        return [
+            StationOut(id=s.id, name=s.name, address=s.address, latitude=s.latitude, longitude=s.longitude,
+                       phone=s.phone, available_slots=5, capacity=s.capacity, opening_time=s.opening_time,
+                       closing_time=s.closing_time, is_open=True)
+            for s in stations
+        ]
+
+    @app.get("/fast/stations", response_model=list[StationOut], response_class=FastJSONResponse)
+    def fast_stations():
+        return FastJSONResponse([station_json(s, True, 5) for s in stations])
+
+    @app.get("/default/companies", response_model=list[CompanyOut])
+    def default_companies():
+        return companies
+
+    @app.get("/fast/companies", response_model=list[CompanyOut], response_class=FastJSONResponse)
+    def fast_companies():
+        return FastJSONResponse([project(c, COMPANY_FIELDS) for c in companies])
+
+    return app
+
+
+def timed(client: TestClient, url: str, repeat: int) -> float:
+    client.get(url)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url)
+        assert response.status_code == 200
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    client = TestClient(build_app(args.rows))
+    assert client.get("/default/stations").json() == client.get("/fast/stations").json()
+    assert client.get("/default/companies").json() == client.get("/fast/companies").json()
+
+    print(f"{args.rows} rows, mean of {args.repeat} requests")
+    for resource in ("stations", "companies"):
+        default_ms = timed(client, f"/default/{resource}", args.repeat)
+        fast_ms = timed(client, f"/fast/{resource}", args.repeat)
+        print(f"  {resource:<10} default {default_ms:8.1f} ms   fast {fast_ms:8.1f} ms   {default_ms / fast_ms:4.1f}x")
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Bulk-import charging stations from a CSV (with header row) or NDJSON file.
+
+Usage: python import_stations.py stations.csv [--format ndjson] [--batch-size 5000]
+"""
+
+import argparse
+import json
+import sys
+
+from app.database import SessionLocal
+from app.services.station_import import import_lines, DEFAULT_BATCH_SIZE
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import charging stations")
+    parser.add_argument("path", help="CSV or NDJSON file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+
+    db = SessionLocal()
+    try:
+        result = import_lines(db, (line.rstrip("\r\n") for line in source), fmt, args.batch_size)
+    finally:
+        db.close()
+        source.close()
+
+    print(f"✅ Inserted {result['inserted']} stations in {result['batches']} batches")
+    if result["error_count"]:
+        print(f"⚠️  {result['error_count']} rows rejected:")
+        for err in result["errors"]:
+            print(f"   line {err['line']}: {err['error']}")
+    print(json.dumps({k: v for k, v in result.items() if k != "errors"}))
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Reconcile payments against bookings: paid bookings with no payment,
+payment totals that differ from the booking amount, duplicate payments.
+
+Usage: python reconcile.py [--chunk-size 50000] [--workers 8] [--sample 100]
+"""
+
+import argparse
+import json
+
+from app.services.reconciliation import reconcile, DEFAULT_CHUNK_SIZE, DEFAULT_SAMPLE
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile payments against bookings")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Booking ids per chunk")
+    parser.add_argument("--workers", type=int, help="Worker processes (defaults to the CPU count, at most 8)")
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE, help="Findings listed per check")
+    args = parser.parse_args()
+
+    result = reconcile(args.chunk_size, args.workers, args.sample)
+
+    print(f"✅ Checked booking ids {result['booking_id_range']} in {result['chunks']} chunks "
+          f"on {result['workers']} workers ({result['elapsed_ms']} ms)")
+    for name, check in result["checks"].items():
+        marker = "⚠️ " if check["count"] else "✅"
+        print(f"{marker} {name}: {check['count']}")
+    print(json.dumps(result, default=str))
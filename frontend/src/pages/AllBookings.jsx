@@ -5,17 +5,25 @@ import { getErrorMessage } from "../utils/error";
 export default function AllBookings() {
   const [bookings, setBookings] = useState([]);
   const [error, setError] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
   const user = JSON.parse(localStorage.getItem("user") || "{}");
 
+  // GET /bookings/ returns one page, newest first; X-Next-Cursor points at the next one
+  const fetchBookings = async (cursor = null) => {
+    setLoading(true);
+    try {
+      const res = await api.get("/bookings/", { params: cursor ? { cursor } : {} });
+      setBookings(prev => (cursor ? [...prev, ...(res.data || [])] : res.data || []));
+      setNextCursor(res.headers["x-next-cursor"] || null);
+    } catch (err) {
+      setError("Failed to fetch bookings: " + getErrorMessage(err));
+    } finally {
+      setLoading(false);
+    }
+  };
+
   useEffect(() => {
-    const fetchBookings = async () => {
-      try {
-        const res = await api.get("/bookings/");
-        setBookings(res.data || []);
-      } catch (err) {
-        setError("Failed to fetch bookings: " + getErrorMessage(err));
-      }
-    };
     fetchBookings();
   }, []);
 
@@ -34,6 +42,12 @@ export default function AllBookings() {
           <p><strong>Status:</strong> {b.status}</p>
         </div>
       ))}
+
+      {nextCursor && (
+        <button onClick={() => fetchBookings(nextCursor)} disabled={loading}>
+          {loading ? "Loading..." : "Load more"}
+        </button>
+      )}
     </div>
   );
 }
@@ -18,8 +18,10 @@ export default function Payment() {
     );
   }
 
-  const { name, car_number, phone, hours, booking_id } = state;
-  const amount = Number(hours) * 60; // ₹60 per hour
+  const { name, car_number, phone, hours } = state;
+  const booking_id = state.booking_id ?? state.id;
+  // Priced by the server; ₹60 per hour only for bookings made before tariffs
+  const amount = state.amount ?? Number(hours) * 60;
 
   const confirmPayment = async () => {
     try {
@@ -0,0 +1,193 @@
+"""
+Concurrency tests for slot reservation and payment.
+Many threads book the same station at once; the station must never be
+oversold and every slot must end up in exactly one booking. Many threads
+paying the same booking at once must record exactly one payment, also
+when the payments arrive as gateway callbacks applied in one batch.
+
+Run from the repository root: python -m pytest test_booking_concurrency.py
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DB_FILE = os.path.join(tempfile.mkdtemp(), "booking_concurrency.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import Base, engine, SessionLocal
+from app import models
+from app.routers import bookings
+from app.schemas import BookingCreate
+from app.services.booking_service import create_booking, NoSlotsAvailable
+from app.services.payment_service import process_payment, PaymentRejected
+from app.services.payment_ingest import PaymentIngest
+
+CAPACITY = 25
+THREADS = 64
+ATTEMPTS_PER_THREAD = 4
+
+
+def make_station(slots):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        station = models.ChargingStation(
+            name="Concurrency Test Station",
+            address="Test Road",
+            latitude=12.97,
+            longitude=77.59,
+            phone="9999999999",
+            available_slots=slots,
+            capacity=slots,
+        )
+        db.add(station)
+        db.commit()
+        return station.id
+    finally:
+        db.close()
+
+
+def booking_request(station_id, n):
+    return BookingCreate(
+        station_id=station_id,
+        name=f"Driver {n}",
+        car_number=f"KA01AB{n:04d}",
+        phone="9876543210",
+        hours=1,
+    )
+
+
+def test_concurrent_bookings_never_oversell():
+    station_id = make_station(CAPACITY)
+    start = threading.Barrier(THREADS)
+    errors = []
+
+    def worker(thread_no):
+        booked = rejected = 0
+        start.wait()
+        for attempt in range(ATTEMPTS_PER_THREAD):
+            db = SessionLocal()
+            try:
+                create_booking(db, booking_request(station_id, thread_no * ATTEMPTS_PER_THREAD + attempt))
+                booked += 1
+            except NoSlotsAvailable:
+                rejected += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.close()
+        return booked, rejected
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(worker, range(THREADS)))
+
+    assert errors == []
+    booked = sum(b for b, _ in results)
+    rejected = sum(r for _, r in results)
+    assert booked == CAPACITY
+    assert rejected == THREADS * ATTEMPTS_PER_THREAD - CAPACITY
+
+    db = SessionLocal()
+    try:
+        station = db.query(models.ChargingStation).get(station_id)
+        assert station.available_slots == 0
+        count = db.query(models.Booking).filter(models.Booking.station_id == station_id).count()
+        assert count == CAPACITY
+    finally:
+        db.close()
+
+
+def test_book_endpoint_returns_409_when_full():
+    station_id = make_station(1)
+    app = FastAPI()
+    app.include_router(bookings.router, prefix="/bookings")
+    client = TestClient(app)
+
+    payload = booking_request(station_id, 0).dict()
+    first = client.post("/bookings/", json=payload)
+    assert first.status_code == 200
+    assert first.json()["status"] == "pending"
+
+    second = client.post("/bookings/", json=payload)
+    assert second.status_code == 409
+
+    missing = client.post("/bookings/", json={**payload, "station_id": 999999})
+    assert missing.status_code == 404
+
+
+def test_concurrent_payments_pay_once():
+    station_id = make_station(1)
+    db = SessionLocal()
+    try:
+        booking = create_booking(db, booking_request(station_id, 0))
+        booking_id, amount = booking.id, booking.amount
+    finally:
+        db.close()
+
+    start = threading.Barrier(THREADS)
+    errors = []
+
+    def worker(_):
+        start.wait()
+        db = SessionLocal()
+        try:
+            process_payment(db, booking_id, amount)
+            return True
+        except PaymentRejected:
+            return False
+        except Exception as e:
+            errors.append(e)
+            return False
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(worker, range(THREADS)))
+
+    assert errors == []
+    assert sum(results) == 1
+
+    db = SessionLocal()
+    try:
+        assert db.query(models.Payment).filter(models.Payment.booking_id == booking_id).count() == 1
+        assert db.query(models.Booking).get(booking_id).status == "confirmed"
+        try:
+            process_payment(db, booking_id, 1)
+            assert False, "second payment accepted"
+        except PaymentRejected:
+            pass
+    finally:
+        db.close()
+
+
+def test_batched_callbacks_pay_once():
+    station_id = make_station(1)
+    db = SessionLocal()
+    try:
+        booking = create_booking(db, booking_request(station_id, 0))
+        ingest = PaymentIngest()
+        callbacks = [ingest.submit(db, booking.id, booking.amount)[0].id for _ in range(5)]
+        callbacks.append(ingest.submit(db, 999999, 10)[0].id)
+        assert ingest.apply_batch(callbacks) == len(callbacks)
+
+        statuses = [db.query(models.PaymentCallback).get(c).status for c in callbacks]
+        assert statuses == ["applied"] + ["rejected"] * 5
+        assert db.query(models.Payment).filter(models.Payment.booking_id == booking.id).count() == 1
+        assert ingest.apply_batch(callbacks) == 0  # Already applied
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    test_concurrent_bookings_never_oversell()
+    test_book_endpoint_returns_409_when_full()
+    test_concurrent_payments_pay_once()
+    test_batched_callbacks_pay_once()
+    print("✅ No oversell under concurrent bookings, no double payment")
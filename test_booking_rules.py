@@ -0,0 +1,217 @@
+"""
+Tests for booking rules that do not depend on timing: how booking windows
+map onto capacity calendar slots, including windows that cross midnight,
+which windows fall within opening hours, and the order in which
+waitlisted requests are promoted into bookings.
+
+Run from the repository root: python -m pytest test_booking_rules.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+DB_FILE = os.path.join(tempfile.mkdtemp(), "booking_rules.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import pytest
+
+from app.database import Base, engine, SessionLocal
+from app import models
+from app.schemas import BookingCreate
+from app.services.booking_lifecycle import cancel_booking
+from app.services.booking_service import create_booking
+from app.services.capacity_calendar import SLOTS_PER_DAY, slot_ranges
+from app.services.waitlist import waitlist
+from app.utils.time_utils import MINUTES_PER_DAY, MINUTES_PER_WEEK, OpenHoursIndex, is_open_throughout, weekly_intervals
+
+DAY = date(2026, 3, 14)
+NEXT_DAY = DAY + timedelta(days=1)
+
+
+def test_window_within_one_day():
+    assert slot_ranges(DAY, time(10, 0), 2) == [(DAY, 40, 47)]
+
+
+def test_partial_slots_count_as_taken():
+    # 10:07-11:07 touches the slots starting 10:00 through 11:00
+    assert slot_ranges(DAY, time(10, 7), 1) == [(DAY, 40, 44)]
+
+
+def test_window_split_at_midnight():
+    assert slot_ranges(DAY, time(23, 30), 1) == [(DAY, 94, 95), (NEXT_DAY, 0, 1)]
+    assert slot_ranges(DAY, time(12, 0), 24) == [(DAY, 48, 95), (NEXT_DAY, 0, 47)]
+
+
+def test_window_ending_at_midnight_stays_on_its_day():
+    assert slot_ranges(DAY, time(23, 0), 1) == [(DAY, 92, SLOTS_PER_DAY - 1)]
+    assert slot_ranges(DAY, time(0, 0), 24) == [(DAY, 0, SLOTS_PER_DAY - 1)]
+
+
+def test_window_length_is_bounded():
+    for hours in (0, 25):
+        with pytest.raises(ValueError):
+            slot_ranges(DAY, time(10, 0), hours)
+
+
+SUNDAY = date(2026, 3, 15)
+
+
+def test_overnight_hours_split_at_the_end_of_the_week():
+    intervals = weekly_intervals(time(22, 0), time(6, 0))
+    assert (22 * 60, MINUTES_PER_DAY + 6 * 60 + 1) in intervals  # Monday night, closing minute included
+    assert (0, 6 * 60 + 1) in intervals  # Sunday night's Monday morning part
+    assert (6 * MINUTES_PER_DAY + 22 * 60, MINUTES_PER_WEEK) in intervals
+    assert len(intervals) == 8
+
+
+def test_equal_opening_and_closing_times_mean_always_open():
+    assert weekly_intervals(time(0, 0), time(0, 0)) == [(0, MINUTES_PER_WEEK)]
+    assert weekly_intervals(time(9, 0), time(9, 0)) == [(0, MINUTES_PER_WEEK)]
+    assert weekly_intervals(None, time(9, 0)) == []
+
+
+def test_open_at_across_midnight_and_the_end_of_the_week():
+    index = OpenHoursIndex([
+        (1, time(22, 0), time(6, 0)),
+        (2, time(6, 0), time(22, 0)),
+        (3, time(9, 0), time(9, 0)),
+        (4, None, None),
+    ])
+    at = lambda day, hour, minute: index.open_at(datetime.combine(day, time(hour, minute)))
+    assert at(SUNDAY, 23, 30) == {1, 3}
+    assert at(SUNDAY + timedelta(days=1), 5, 30) == {1, 3}
+    assert at(SUNDAY + timedelta(days=1), 6, 0) == {1, 2, 3}  # Closing and opening minute
+    assert at(SUNDAY + timedelta(days=1), 6, 1) == {2, 3}
+    assert at(DAY, 12, 0) == {2, 3}
+    assert at(DAY, 22, 0) == {1, 2, 3}
+
+
+def window(start_hour, start_minute, hours):
+    start = datetime.combine(DAY, time(start_hour, start_minute))
+    return start, start + timedelta(hours=hours)
+
+
+def test_window_must_fit_opening_hours():
+    day_hours = (time(6, 0), time(22, 0))
+    assert is_open_throughout(*day_hours, *window(20, 0, 2))
+    assert not is_open_throughout(*day_hours, *window(21, 0, 2))
+    assert not is_open_throughout(*day_hours, *window(3, 0, 1))
+    assert not is_open_throughout(*day_hours, *window(10, 0, 24))
+
+    overnight = (time(22, 0), time(6, 0))
+    assert is_open_throughout(*overnight, *window(23, 0, 7))
+    assert not is_open_throughout(*overnight, *window(23, 0, 8))
+    assert is_open_throughout(*overnight, *window(1, 30, 4))
+
+    around_the_clock = (time(0, 0), time(0, 0))
+    assert is_open_throughout(*around_the_clock, *window(13, 0, 24))
+    assert not is_open_throughout(None, None, *window(13, 0, 1))
+
+
+def test_open_hours_index_matches_single_station_check():
+    hours = [
+        (time(6, 0), time(22, 0)), (time(22, 0), time(6, 0)), (time(0, 0), time(0, 0)),
+        (time(0, 0), time(23, 59)), (time(8, 30), time(8, 0)), (None, None),
+    ]
+    index = OpenHoursIndex((i, opening, closing) for i, (opening, closing) in enumerate(hours))
+    for day in (DAY, SUNDAY):
+        for start_time in (time(0, 0), time(5, 30), time(8, 15), time(20, 0), time(22, 0), time(23, 30)):
+            start = datetime.combine(day, start_time)
+            for length in (1, 2, 8, 24):
+                end = start + timedelta(hours=length)
+                expected = {i for i, h in enumerate(hours) if is_open_throughout(*h, start, end)}
+                assert index.open_throughout(start, end) == expected, (start, length)
+
+
+def make_full_station():
+    """A one-charger station with its charger booked; returns (station_id, booking_id)"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        station = models.ChargingStation(
+            name="Waitlist Test Station", address="Test Road", latitude=12.97, longitude=77.59,
+            phone="9999999999", available_slots=1, capacity=1
+        )
+        db.add(station)
+        db.commit()
+        booking = create_booking(db, BookingCreate(
+            station_id=station.id, name="First", car_number="KA01AB0000", phone="9876543210", hours=1
+        ))
+        return station.id, booking.id
+    finally:
+        db.close()
+
+
+def join(db, station_id, name, priority):
+    request = SimpleNamespace(
+        station_id=station_id, name=name, car_number=name, phone="9876543210", hours=1
+    )
+    return waitlist.enqueue(db, request, priority=priority)
+
+
+def test_waitlist_promotes_by_priority_then_arrival():
+    station_id, booking_id = make_full_station()
+    db = SessionLocal()
+    try:
+        entries = {name: join(db, station_id, name, priority)
+                   for name, priority in [("a", 0), ("b", 5), ("c", 0), ("d", 5), ("e", 0)]}
+        assert all(e.status == "waiting" for e in entries.values())
+        assert [waitlist.position(db, entries[n]) for n in "bdace"] == [1, 2, 3, 4, 5]
+
+        # Leaving the queue skips the entry without holding up the rest
+        assert waitlist.cancel(db, entries["c"].id)
+        assert [waitlist.position(db, entries[n]) for n in "bdae"] == [1, 2, 3, 4]
+
+        promoted = []
+        for _ in range(4):
+            cancel_booking(db, booking_id)
+            db.expire_all()
+            entry = db.query(models.WaitlistEntry).filter(
+                models.WaitlistEntry.station_id == station_id,
+                models.WaitlistEntry.status == "promoted",
+                models.WaitlistEntry.booking_id.isnot(None),
+                models.WaitlistEntry.name.notin_(promoted)
+            ).one()
+            promoted.append(entry.name)
+            booking_id = entry.booking_id
+
+        assert promoted == ["b", "d", "a", "e"]
+        assert db.get(models.WaitlistEntry, entries["c"].id).status == "cancelled"
+        station = db.get(models.ChargingStation, station_id)
+        assert station.available_slots == 0
+    finally:
+        db.close()
+
+
+def test_waitlist_entry_is_booked_at_once_when_a_slot_is_free():
+    station_id, booking_id = make_full_station()
+    db = SessionLocal()
+    try:
+        cancel_booking(db, booking_id)
+        entry = join(db, station_id, "late", 0)
+        db.refresh(entry)
+        assert entry.status == "promoted"
+        booking = db.get(models.Booking, entry.booking_id)
+        assert booking.status == "pending" and booking.amount is not None
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    test_window_within_one_day()
+    test_partial_slots_count_as_taken()
+    test_window_split_at_midnight()
+    test_window_ending_at_midnight_stays_on_its_day()
+    test_window_length_is_bounded()
+    test_overnight_hours_split_at_the_end_of_the_week()
+    test_equal_opening_and_closing_times_mean_always_open()
+    test_open_at_across_midnight_and_the_end_of_the_week()
+    test_window_must_fit_opening_hours()
+    test_open_hours_index_matches_single_station_check()
+    test_waitlist_promotes_by_priority_then_arrival()
+    test_waitlist_entry_is_booked_at_once_when_a_slot_is_free()
+    print("✅ Booking windows map onto the right calendar slots and opening hours, waitlists promote in order")
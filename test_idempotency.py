@@ -0,0 +1,126 @@
+"""
+Tests for Idempotency-Key handling: claiming a key, replaying its stored
+response, conflicts and in-progress retries, releasing a key after a
+failure, and taking over keys whose claim was abandoned or has expired.
+
+Run from the repository root: python -m pytest test_idempotency.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+DB_FILE = os.path.join(tempfile.mkdtemp(), "idempotency.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import pytest
+from fastapi import HTTPException
+
+from app.database import Base, engine, SessionLocal
+from app import models
+from app.services import idempotency
+from app.services.idempotency import (
+    CLAIM_TIMEOUT, IDEMPOTENCY_TTL, IdempotencyConflict, IdempotencyInProgress, claim, complete, release
+)
+from app.utils.idempotency import idempotent
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def forget_responses():
+    """Drop the in-process LRU so the next claim reads the database, as another worker would"""
+    with idempotency._lock:
+        idempotency._lru.clear()
+
+
+def age_claim(db, key, by):
+    record = db.get(models.IdempotencyRecord, key)
+    record.created_at = datetime.utcnow() - by
+    db.commit()
+
+
+def test_first_claim_runs_and_retries_wait_for_it(db):
+    assert claim(db, "t:wait", "a") is None
+    with pytest.raises(IdempotencyInProgress):
+        claim(db, "t:wait", "a")
+    with pytest.raises(IdempotencyConflict):
+        claim(db, "t:wait", "b")
+
+
+def test_completed_key_replays_its_response(db):
+    assert claim(db, "t:replay", "a") is None
+    complete(db, "t:replay", "a", 200, '{"id": 1}')
+
+    for lru in (True, False):
+        if not lru:
+            forget_responses()
+        stored = claim(db, "t:replay", "a")
+        assert (stored.status_code, stored.body) == (200, '{"id": 1}')
+        with pytest.raises(IdempotencyConflict):
+            claim(db, "t:replay", "b")
+
+
+def test_released_key_runs_again(db):
+    assert claim(db, "t:release", "a") is None
+    release(db, "t:release")
+    assert claim(db, "t:release", "b") is None
+
+
+def test_abandoned_claim_is_taken_over_once(db):
+    assert claim(db, "t:abandoned", "a") is None
+    age_claim(db, "t:abandoned", CLAIM_TIMEOUT * 2)
+
+    assert claim(db, "t:abandoned", "b") is None
+    # The takeover is a fresh claim: the next retry waits for it
+    with pytest.raises(IdempotencyInProgress):
+        claim(db, "t:abandoned", "b")
+
+
+def test_expired_response_is_taken_over(db):
+    assert claim(db, "t:expired", "a") is None
+    complete(db, "t:expired", "a", 200, '{"id": 1}')
+    forget_responses()
+    age_claim(db, "t:expired", IDEMPOTENCY_TTL * 2)
+
+    assert claim(db, "t:expired", "b") is None
+    record = db.get(models.IdempotencyRecord, "t:expired")
+    db.refresh(record)
+    assert (record.request_hash, record.status_code, record.response_body) == ("b", None, None)
+
+
+def test_idempotent_runs_once_and_releases_on_failure(db):
+    calls = []
+
+    def run():
+        calls.append(1)
+        return {"booking_id": len(calls)}
+
+    first = idempotent(db, "t", "once", {"x": 1}, run)
+    again = idempotent(db, "t", "once", {"x": 1}, run)
+    assert len(calls) == 1 and first.body == again.body
+    assert again.headers["Idempotent-Replayed"] == "true"
+    with pytest.raises(HTTPException) as error:
+        idempotent(db, "t", "once", {"x": 2}, run)
+    assert error.value.status_code == 422
+
+    def fail():
+        raise HTTPException(status_code=409, detail="No slots")
+
+    with pytest.raises(HTTPException):
+        idempotent(db, "t", "retry", {"x": 1}, fail)
+    idempotent(db, "t", "retry", {"x": 1}, run)
+    assert len(calls) == 2
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,98 @@
+"""
+Tests for k-nearest station search: pages read with the (distance, id)
+cursor must add up to the full nearest-first list, with no station repeated
+or skipped, whether the search runs on the catalog or in SQL.
+
+Run from the repository root: python -m pytest test_station_search.py
+"""
+
+import os
+import sys
+import tempfile
+
+DB_FILE = os.path.join(tempfile.mkdtemp(), "station_search.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import pytest
+from fastapi import HTTPException
+
+from app.database import Base, engine, SessionLocal
+from app import models
+from app.routers.stations import decode_nearby_cursor, encode_nearby_cursor
+from app.services.station_catalog import get_catalog, invalidate_catalog, peek_catalog
+from app.services.station_search import nearest_stations
+
+LAT, LON = -33.87, 151.21  # Away from the stations other test modules create
+
+
+@pytest.fixture(scope="module")
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    # A line of stations heading north, two of them sharing each spot, and one far away
+    for i in range(10):
+        for twin in range(2):
+            session.add(models.ChargingStation(
+                name=f"Station {i}{'ab'[twin]}", address="Test Road", latitude=LAT + i * 0.01, longitude=LON,
+                phone="9999999999", available_slots=1, capacity=1
+            ))
+    session.add(models.ChargingStation(
+        name="Far Station", address="Test Road", latitude=LAT + 5, longitude=LON,
+        phone="9999999999", available_slots=1, capacity=1
+    ))
+    session.commit()
+    invalidate_catalog()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def read_pages(db, k, radius_km=50):
+    pages, after = [], None
+    while True:
+        page, has_more = nearest_stations(db, LAT, LON, radius_km, k, after)
+        pages.append([(round(d, 6), s.id) for s, d in page])
+        if not has_more:
+            return pages
+        # What the client sends back: the cursor of the last station it got
+        after = decode_nearby_cursor(encode_nearby_cursor(*pages[-1][-1]))
+
+
+@pytest.mark.parametrize("use_catalog", [False, True])
+def test_pages_add_up_to_the_nearest_first_list(db, use_catalog):
+    if use_catalog:
+        get_catalog(db)
+    else:
+        invalidate_catalog()
+    assert (peek_catalog() is not None) == use_catalog
+
+    everything, has_more = nearest_stations(db, LAT, LON, 50, 100)
+    assert not has_more and len(everything) == 20
+    expected = [(round(d, 6), s.id) for s, d in everything]
+    assert expected == sorted(expected)
+
+    for k in (1, 3, 7, 20):
+        pages = read_pages(db, k)
+        assert [station for page in pages for station in page] == expected
+        assert all(len(page) == k for page in pages[:-1])
+
+
+def test_only_ids_filters_before_the_page_is_cut(db):
+    everything, _ = nearest_stations(db, LAT, LON, 50, 100)
+    odd = frozenset(s.id for s, _ in everything if s.id % 2)
+    page, has_more = nearest_stations(db, LAT, LON, 50, 5, only_ids=odd)
+    assert len(page) == 5 and has_more
+    assert all(s.id in odd for s, _ in page)
+
+
+def test_cursor_round_trip_and_garbage():
+    assert decode_nearby_cursor(encode_nearby_cursor(1.234567, 42)) == (1.234567, 42)
+    with pytest.raises(HTTPException) as error:
+        decode_nearby_cursor("not-a-cursor")
+    assert error.value.status_code == 400
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,91 @@
+"""
+Tests for the compiled tariff table. Prices of bands that wrap past
+midnight, min_hours tiers, bookings of a day or more and station rules
+overriding charging-type rules must all match a plain hour-by-hour sum.
+
+Run from the repository root: python -m pytest test_tariffs.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.services.tariffs import DEFAULT_RATE_PER_HOUR, TariffRule, TariffTable
+
+BASE = DEFAULT_RATE_PER_HOUR
+
+
+def rule(rule_id, rate, start_hour=0, end_hour=24, min_hours=1, station_id=None, charging_type=None):
+    return TariffRule(rule_id, station_id, charging_type, start_hour, end_hour, min_hours, rate)
+
+
+def test_no_tariffs_charge_the_default_rate():
+    table = TariffTable(0, [], {})
+    assert table.quote_one(1, "AC", 9, 3) == 3 * BASE
+
+
+def test_band_wrapping_past_midnight():
+    table = TariffTable(0, [rule(1, 30, start_hour=22, end_hour=6)], {})
+    assert table.quote_one(1, "AC", 21, 3) == BASE + 30 + 30
+    assert table.quote_one(1, "AC", 5, 2) == 30 + BASE
+    assert table.quote_one(1, "AC", 23, 8) == 7 * 30 + BASE
+
+
+def test_min_hours_tiers_price_the_whole_booking():
+    table = TariffTable(0, [rule(1, 40, min_hours=3)], {})
+    assert table.quote_one(1, "AC", 10, 2) == 2 * BASE
+    assert table.quote_one(1, "AC", 10, 3) == 3 * 40
+    assert table.quote_one(1, "AC", 10, 5) == 5 * 40
+
+
+def test_bookings_of_a_day_or_more():
+    table = TariffTable(0, [rule(1, 30, start_hour=22, end_hour=6), rule(2, 45, min_hours=24)], {})
+    assert table.quote_one(1, "AC", 0, 24) == 24 * 45
+    assert table.quote_one(1, "AC", 7, 26) == 26 * 45
+    assert table.quote_one(1, "AC", 0, 23) == 7 * 30 + 16 * BASE
+
+    night_only = TariffTable(0, [rule(1, 30, start_hour=22, end_hour=6)], {})
+    one_day = 8 * 30 + 16 * BASE
+    assert night_only.quote_one(1, "AC", 0, 24) == one_day
+    assert night_only.quote_one(1, "AC", 0, 26) == one_day + 30 + 30
+    assert night_only.quote_one(1, "AC", 12, 48) == 2 * one_day
+
+
+def test_station_rules_override_type_rules():
+    rules = [rule(1, 100, charging_type="DC"), rule(2, 50, start_hour=8, end_hour=12, station_id=5)]
+    table = TariffTable(0, rules, {5: "DC"})
+    assert table.quote_one(5, "DC", 7, 2) == 100 + 50
+    assert table.quote_one(5, "DC", 9, 2) == 2 * 50
+    assert table.quote_one(6, "DC", 9, 2) == 2 * 100
+    assert table.quote_one(7, "AC", 9, 2) == 2 * BASE
+
+
+def test_vectorized_quote_matches_single_quotes():
+    rules = [
+        rule(1, 30, start_hour=22, end_hour=6),
+        rule(2, 100, charging_type="DC"),
+        rule(3, 80, min_hours=4, charging_type="DC"),
+        rule(4, 50, start_hour=8, end_hour=12, station_id=5),
+    ]
+    table = TariffTable(0, rules, {5: "DC"})
+
+    class Station:
+        def __init__(self, id, charging_type):
+            self.id, self.charging_type = id, charging_type
+
+    stations = [Station(5, "DC"), Station(6, "DC"), Station(7, "AC"), Station(5, "DC")]
+    starts = [7, 23, 21, 0]
+    hours = [2, 5, 3, 30]
+    quotes = table.quote(stations, starts, hours).tolist()
+    assert quotes == [table.quote_one(s.id, s.charging_type, h0, h) for s, h0, h in zip(stations, starts, hours)]
+
+
+if __name__ == "__main__":
+    test_no_tariffs_charge_the_default_rate()
+    test_band_wrapping_past_midnight()
+    test_min_hours_tiers_price_the_whole_booking()
+    test_bookings_of_a_day_or_more()
+    test_station_rules_override_type_rules()
+    test_vectorized_quote_matches_single_quotes()
+    print("✅ Tariff quotes match hour-by-hour prices")